@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+from collections import deque, namedtuple
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt, QTimer
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPen
+from PyQt6.QtWidgets import QAbstractItemView, QListView, QStyledItemDelegate
+
+logger = logging.getLogger(__name__)
+
+# Coalesce bursts from the agent thread into one model update per frame
+FLUSH_INTERVAL_MS = 16
+
+LogEntry = namedtuple("LogEntry", ["kind", "text"])
+
+CLICK_LABELS = {
+    "left_click": "Left Click",
+    "right_click": "Right Click",
+    "middle_click": "Middle Click",
+    "double_click": "Double Click",
+}
+
+
+def parse_message(message):
+    """Turn an update_callback message into a LogEntry, or None to skip it."""
+    if message.startswith("Performed action:"):
+        action_text = message.replace("Performed action:", "").strip()
+        try:
+            action_data = json.loads(action_text)
+        except json.JSONDecodeError:
+            return LogEntry("action", action_text)
+
+        action_type = action_data.get("type", "").lower()
+        if action_type == "type":
+            return LogEntry("action", f'⌨️  Type "{action_data.get("text", "")}"')
+        if action_type == "key":
+            return LogEntry("action", f"⌨️  Press {action_data.get('text', '')}")
+        if action_type == "mouse_move":
+            x, y = action_data.get("x", 0), action_data.get("y", 0)
+            return LogEntry("action", f"🖱️  Move to ({x}, {y})")
+        if action_type == "screenshot":
+            return LogEntry("action", "📸  Captured Screenshot")
+        if "click" in action_type:
+            x, y = action_data.get("x", 0), action_data.get("y", 0)
+            label = CLICK_LABELS.get(action_type, "Click")
+            return LogEntry("action", f"👆  {label} ({x}, {y})")
+        return None
+
+    if message.startswith("Assistant:"):
+        return LogEntry("assistant", f"💬 {message.replace('Assistant:', '').strip()}")
+    if message.startswith("Assistant action:"):
+        return LogEntry(
+            "assistant_action",
+            f"🤖 {message.replace('Assistant action:', '').strip()}",
+        )
+    return LogEntry("info", message)
+
+
+class ActionLogModel(QAbstractListModel):
+    """List model over a bounded ring buffer of LogEntry rows.
+
+    `append` may be called many times per frame; entries are queued and
+    inserted by a single-shot timer, so a burst costs one insert (and at
+    most one removal of the oldest rows) instead of one relayout each.
+    """
+
+    def __init__(self, max_entries=None, parent=None):
+        super().__init__(parent)
+        if max_entries is None:
+            max_entries = int(os.getenv("ACTION_LOG_MAX_ENTRIES", "10000"))
+        self.max_entries = max(max_entries, 1)
+        self.entries = deque(maxlen=self.max_entries)
+        self.pending = []
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.entries):
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return entry.text
+        if role == Qt.ItemDataRole.UserRole:
+            return entry
+        return None
+
+    def append(self, entry):
+        self.pending.append(entry)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending = self.pending[-self.max_entries :]
+        self.pending = []
+
+        overflow = min(
+            len(self.entries) + len(pending) - self.max_entries, len(self.entries)
+        )
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.entries.popleft()
+            self.endRemoveRows()
+
+        first = len(self.entries)
+        self.beginInsertRows(QModelIndex(), first, first + len(pending) - 1)
+        self.entries.extend(pending)
+        self.endInsertRows()
+
+    def clear(self):
+        self.flush_timer.stop()
+        self.pending = []
+        self.beginResetModel()
+        self.entries.clear()
+        self.endResetModel()
+
+
+class ActionLogDelegate(QStyledItemDelegate):
+    """Paints log rows directly instead of laying out rich text.
+
+    Actions are drawn as pills, assistant text with a left rule and other
+    messages as plain lines. Row heights are cached per text and width, so
+    scrolling through a long log does not re-measure rows.
+    """
+
+    PADDING = 6
+    PILL_PADDING = 12
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font = QFont("Inter")
+        self.font.setPixelSize(13)
+        self.small_font = QFont("Inter")
+        self.small_font.setPixelSize(12)
+        self.small_font.setItalic(True)
+        self.colors = {}
+        self.set_colors({"text": "#e0e0e0", "accent": "#4CAF50"})
+        self._heights = {}
+
+    def set_colors(self, colors):
+        self.colors = {
+            "text": QColor(colors.get("log_text", colors["text"])),
+            "muted": QColor("#666666"),
+            "accent": QColor(colors["accent"]),
+            "completion": QColor("#FFD700"),
+            "pill": QColor(45, 45, 45, 242),
+            "pill_border": QColor(255, 255, 255, 26),
+        }
+
+    def _font(self, entry):
+        return self.small_font if entry.kind == "assistant_action" else self.font
+
+    def _text_rect(self, entry, rect):
+        inset = 18 if entry.kind == "assistant" else 0
+        return rect.adjusted(inset, self.PADDING, 0, -self.PADDING)
+
+    def sizeHint(self, option, index):
+        entry = index.data(Qt.ItemDataRole.UserRole)
+        width = max(option.rect.width(), 100)
+        key = (entry, width)
+        height = self._heights.get(key)
+        if height is None:
+            metrics = QFontMetrics(self._font(entry))
+            if entry.kind in ("action", "completion"):
+                height = metrics.height() + 2 * self.PADDING + 8
+            else:
+                rect = self._text_rect(entry, QRect(0, 0, width, 100000))
+                bounds = metrics.boundingRect(
+                    rect, Qt.TextFlag.TextWordWrap, entry.text
+                )
+                height = bounds.height() + 2 * self.PADDING
+            if len(self._heights) > 20000:
+                self._heights.clear()
+            self._heights[key] = height
+        return QSize(width, height)
+
+    def paint(self, painter, option, index):
+        entry = index.data(Qt.ItemDataRole.UserRole)
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        painter.setFont(self._font(entry))
+        rect = option.rect
+
+        if entry.kind in ("action", "completion"):
+            metrics = QFontMetrics(self.font)
+            pill = QRect(
+                rect.left(),
+                rect.top() + self.PADDING,
+                metrics.horizontalAdvance(entry.text) + 2 * self.PILL_PADDING,
+                metrics.height() + 8,
+            )
+            painter.setPen(QPen(self.colors["pill_border"], 1))
+            painter.setBrush(self.colors["pill"])
+            painter.drawRoundedRect(pill, pill.height() / 2, pill.height() / 2)
+            color = self.colors["accent" if entry.kind == "action" else "completion"]
+            painter.setPen(color)
+            painter.drawText(pill, Qt.AlignmentFlag.AlignCenter, entry.text)
+        else:
+            if entry.kind == "assistant":
+                painter.setPen(QPen(self.colors["muted"], 2))
+                painter.drawLine(
+                    rect.left() + 1,
+                    rect.top() + self.PADDING,
+                    rect.left() + 1,
+                    rect.bottom() - self.PADDING,
+                )
+            color = self.colors["muted" if entry.kind == "assistant_action" else "text"]
+            painter.setPen(color)
+            painter.drawText(
+                self._text_rect(entry, rect),
+                Qt.TextFlag.TextWordWrap | Qt.AlignmentFlag.AlignTop,
+                entry.text,
+            )
+        painter.restore()
+
+
+class ActionLogView(QListView):
+    """Read-only log of agent messages backed by ActionLogModel.
+
+    Keeps the view pinned to the newest entry unless the user has scrolled
+    up to read something.
+    """
+
+    def __init__(self, max_entries=None, parent=None):
+        super().__init__(parent)
+        self.log_model = ActionLogModel(max_entries, self)
+        self.delegate = ActionLogDelegate(self)
+        self.setModel(self.log_model)
+        self.setItemDelegate(self.delegate)
+
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setWordWrap(True)
+
+        self._follow = True
+        self.verticalScrollBar().valueChanged.connect(self._track_follow)
+        self.log_model.rowsInserted.connect(self._scroll_if_following)
+
+    def append(self, message):
+        entry = parse_message(message)
+        if entry is not None:
+            self.log_model.append(entry)
+
+    def append_completion(self, text):
+        self.log_model.append(LogEntry("completion", text))
+
+    def clear(self):
+        self.log_model.clear()
+        self._follow = True
+
+    def set_colors(self, colors):
+        self.delegate.set_colors(colors)
+        self.viewport().update()
+
+    def _track_follow(self, value):
+        scrollbar = self.verticalScrollBar()
+        self._follow = value >= scrollbar.maximum() - 4
+
+    def _scroll_if_following(self, *args):
+        if self._follow:
+            QTimer.singleShot(0, self.scrollToBottom)
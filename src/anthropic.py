@@ -1,68 +1,27 @@
-import anthropic
-from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
+import functools
+import logging
 import os
+import re
+import threading
+import time
+
+import httpx
 from dotenv import load_dotenv
-import logging
 
-class AnthropicClient:
-    def __init__(self):
-        load_dotenv()  # Load environment variables from .env file
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-        
-        try:
-            self.client = anthropic.Anthropic(api_key=self.api_key)
-        except Exception as e:
-            raise ValueError(f"Failed to initialize Anthropic client: {str(e)}")
-        
-    def get_next_action(self, run_history) -> BetaMessage:
-        try:
-            # Convert BetaMessage objects to dictionaries
-            cleaned_history = []
-            for message in run_history:
-                if isinstance(message, BetaMessage):
-                    cleaned_history.append({
-                        "role": message.role,
-                        "content": message.content
-                    })
-                elif isinstance(message, dict):
-                    cleaned_history.append(message)
-                else:
-                    raise ValueError(f"Unexpected message type: {type(message)}")
-            
-            response = self.client.beta.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1024,
-                tools=[
-                    {
-                        "type": "computer_20241022",
-                        "name": "computer",
-                        "display_width_px": 800, #1280
-                        "display_height_px": 600, #800
-                        "display_number": 1,
-                    },
-                    {
-                        "name": "finish_run",
-                        "description": "Call this function when you have achieved the goal of the task.",
-                        "input_schema": {
-                            "type": "object",
-                            "properties": {
-                                "success": {
-                                    "type": "boolean",
-                                    "description": "Whether the task was successful"
-                                },
-                                "error": {
-                                    "type": "string",
-                                    "description": "The error message if the task was not successful"
-                                }
-                            },
-                            "required": ["success"]
-                        }
-                    }
-                ],
-                messages=cleaned_history,
-                system = """
+import anthropic
+from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
+
+from .history import count_images, payload_size
+from .sessions import resolve_blobs
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+MODEL = "claude-3-5-sonnet-20241022"
+BETAS = ["computer-use-2024-10-22", "prompt-caching-2024-07-31"]
+CACHE_CONTROL = {"type": "ephemeral"}
+
+SYSTEM_PROMPT = """
 The user will ask you to help them perform a computer settings related task, and you should guide them one step at a time. 
 Give them clear instructions on what to do next in a detailed, visual manner. Always remember that the user is taking actions 
 and that you only instruct them on which actions to take.
@@ -74,7 +33,8 @@ If the outcome is not correct, provide new, alternative advice.
 Only when you confirm that a step was executed correctly should you move on to the next one. 
 
 You should always call a tool! Always return a tool call. 
-The ONLY allowed tools are "mouse_move". Additionally remember to call the `finish_run` tool when the user has achieved the goal of the task and to call "screenshot" for the first call. 
+The ONLY allowed tools are "mouse_move". Additionally remember to call the `finish_run` tool when the user has achieved the goal of the task. 
+The first message already includes a screenshot of the user's screen, so start guiding right away; only call "screenshot" if you need a fresh view without the user acting. 
 Only call the `finish_run` tool when you have verified via a screenshot that the user has achieved the goal of the task.
 
 Do not explain once the task is finished; just call the tool. 
@@ -83,30 +43,388 @@ When the user asks you to enable dark mode, here is what you will do:
 Move to the gear wheel labelled "System Settings" to open up system settings. Then navigate to "Appearance" and enable dark mode.
 Never open System Settings through any other way than the gear wheel icon on the Desktop.
 Whenever an action requires you to open Settings, the first thing you will do is navigate to the gear wheel.
-""",
+"""
+
+# The system prompt never changes between turns, so it is built once and
+# carries a cache breakpoint; the tool list does the same per display size.
+SYSTEM = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+
+
+@functools.lru_cache(maxsize=8)
+def build_tools(display_size=(1280, 800)):
+    """Tool definitions for one AI display size.
+
+    Cached so every turn on the same display sends an identical, cacheable
+    tool list.
+    """
+    display_width, display_height = display_size
+    return [
+        {
+            "type": "computer_20241022",
+            "name": "computer",
+            "display_width_px": display_width,
+            "display_height_px": display_height,
+            "display_number": 1,
+        },
+        {
+            "name": "finish_run",
+            "description": "Call this function when you have achieved the goal of the task.",
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    "success": {
+                        "type": "boolean",
+                        "description": "Whether the task was successful",
+                    },
+                    "error": {
+                        "type": "string",
+                        "description": "The error message if the task was not successful",
+                    },
+                },
+                "required": ["success"],
+            },
+            "cache_control": CACHE_CONTROL,
+        },
+    ]
+
+
+def add_history_cache_breakpoints(messages, count=2):
+    """Return a copy of `messages` with cache breakpoints on the last user turns.
+
+    Marking the newest user message writes this turn's prefix to the cache;
+    marking the one before lets the request read the prefix written last turn.
+    Together with the system prompt and tools this uses all four breakpoints
+    the API allows. `run_history` itself is never modified.
+    """
+    marked = list(messages)
+    remaining = count
+    for index in range(len(marked) - 1, -1, -1):
+        if remaining == 0:
+            break
+        message = marked[index]
+        if not isinstance(message, dict) or message.get("role") != "user":
+            continue
+        content = message["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content:
+            continue
+        content = list(content)
+        content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+        marked[index] = {**message, "content": content}
+        remaining -= 1
+    return marked
+
+
+class CacheStats:
+    """Per-turn and cumulative prompt cache accounting."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.saved_input_tokens = 0
+
+    def record(self, usage):
+        read = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        uncached = getattr(usage, "input_tokens", 0) or 0
+        if read:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.saved_input_tokens += read
+        logger.info(
+            "Prompt cache %s: read=%d written=%d uncached=%d tokens "
+            "(run totals: %d hits, %d misses, %d tokens served from cache)",
+            "hit" if read else "miss",
+            read,
+            written,
+            uncached,
+            self.hits,
+            self.misses,
+            self.saved_input_tokens,
+        )
+        return {"read": read, "written": written, "uncached": uncached}
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.saved_input_tokens = 0
+
+
+_COORDINATE_RE = re.compile(r'"coordinate"\s*:\s*\[\s*(-?\d+)\s*,\s*(-?\d+)\s*\]')
+_ACTION_RE = re.compile(r'"action"\s*:\s*"([a-z_]+)"')
+_SENTENCE_END_RE = re.compile(r"[.!?:]\s|\n")
+
+
+class StreamHandler:
+    """Turns streaming events into early text and highlight callbacks.
 
-                betas=["computer-use-2024-10-22"],
+    Text is flushed to `on_text` a sentence at a time so the log does not get
+    one entry per token. The `computer` tool input is scanned as its JSON
+    arrives, and `on_coordinate` fires once as soon as a complete mouse_move
+    coordinate has been seen.
+    """
+
+    def __init__(self, on_text=None, on_coordinate=None):
+        self.on_text = on_text
+        self.on_coordinate = on_coordinate
+        self.text_buffer = ""
+        self.tool_name = None
+        self.tool_json = ""
+        self.coordinate_sent = False
+
+    def handle(self, event):
+        if event.type == "content_block_start":
+            block = event.content_block
+            self.tool_name = block.name if block.type == "tool_use" else None
+            self.tool_json = ""
+        elif event.type == "content_block_delta":
+            delta = event.delta
+            if delta.type == "text_delta":
+                self.text_buffer += delta.text
+                self._flush_sentences()
+            elif delta.type == "input_json_delta":
+                self.tool_json += delta.partial_json
+                self._check_coordinate()
+        elif event.type == "content_block_stop":
+            self.flush()
+
+    def flush(self):
+        text = self.text_buffer.strip()
+        self.text_buffer = ""
+        if text and self.on_text:
+            self.on_text(text)
+
+    def _flush_sentences(self):
+        boundary = None
+        for match in _SENTENCE_END_RE.finditer(self.text_buffer):
+            boundary = match.end()
+        if boundary is None:
+            return
+        text = self.text_buffer[:boundary].strip()
+        self.text_buffer = self.text_buffer[boundary:]
+        if text and self.on_text:
+            self.on_text(text)
+
+    def _check_coordinate(self):
+        if self.coordinate_sent or self.tool_name != "computer":
+            return
+        action = _ACTION_RE.search(self.tool_json)
+        if not action or action.group(1) != "mouse_move":
+            return
+        coordinate = _COORDINATE_RE.search(self.tool_json)
+        if not coordinate:
+            return
+        self.coordinate_sent = True
+        if self.on_coordinate:
+            self.on_coordinate(int(coordinate.group(1)), int(coordinate.group(2)))
+
+
+class AnthropicClient:
+    # Keep-alive connections idle longer than this are dropped by the pool, so
+    # a warm-up older than this no longer saves a handshake
+    KEEPALIVE_EXPIRY = 60.0
+
+    def __init__(self):
+        load_dotenv()  # Load environment variables from .env file
+        self.api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not self.api_key:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+
+        try:
+            self.http_client = anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=10,
+                    max_keepalive_connections=4,
+                    keepalive_expiry=self.KEEPALIVE_EXPIRY,
+                ),
             )
+            # The SDK retries 408/409/429/5xx (including 529 overloaded) with
+            # exponential backoff and honours retry-after / retry-after-ms
+            self.client = anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                http_client=self.http_client,
+                max_retries=int(os.getenv("API_MAX_RETRIES", "4")),
+            )
+        except Exception as e:
+            raise ValueError(f"Failed to initialize Anthropic client: {str(e)}")
+
+        self.cache_stats = CacheStats()
+        self.last_warm_up = 0.0
+
+    async def warm_up(self):
+        """Open a pooled TLS connection to the API ahead of the first request."""
+        now = time.monotonic()
+        if now - self.last_warm_up < self.KEEPALIVE_EXPIRY / 2:
+            return
+        self.last_warm_up = now
+        try:
+            # Any response will do; the point is the handshake left in the pool
+            await self.http_client.head(str(self.client.base_url), timeout=10)
+            logger.debug("Pre-connected to %s", self.client.base_url)
+        except httpx.HTTPError as e:
+            self.last_warm_up = 0.0
+            logger.info("Pre-connect to the API failed: %s", e)
+
+    def preconnect(self):
+        """Schedule warm_up on the shared event loop without blocking."""
+        from .runtime import get_runtime
+
+        get_runtime().submit(self.warm_up())
+
+    def _clean_history(self, run_history):
+        """Convert BetaMessage objects to dictionaries and inline stored images"""
+        cleaned_history = []
+        for message in run_history:
+            if isinstance(message, BetaMessage):
+                cleaned_history.append(
+                    {"role": message.role, "content": message.content}
+                )
+            elif isinstance(message, dict):
+                content = resolve_blobs(message.get("content"))
+                if content is not message.get("content"):
+                    message = {**message, "content": content}
+                cleaned_history.append(message)
+            else:
+                raise ValueError(f"Unexpected message type: {type(message)}")
+        return cleaned_history
+
+    async def count_tokens(self, run_history, display_size=(1280, 800)):
+        """Exact input token count for a request, via the count_tokens endpoint."""
+        result = await self.client.beta.messages.count_tokens(
+            model=MODEL,
+            tools=build_tools(tuple(display_size)),
+            messages=self._clean_history(run_history),
+            system=SYSTEM,
+            betas=BETAS + ["token-counting-2024-11-01"],
+        )
+        return result.input_tokens
+
+    async def get_next_action(
+        self,
+        run_history,
+        on_text=None,
+        on_coordinate=None,
+        display_size=(1280, 800),
+        cache_stats=None,
+    ) -> BetaMessage:
+        """Ask the model for the next step.
+
+        `display_size` is the AI coordinate space declared to the computer
+        tool; it must match the screenshots being sent. When `on_text` or
+        `on_coordinate` is given the response is streamed and the callbacks
+        fire while it arrives; the complete message is returned either way.
+        Prompt cache usage goes to `cache_stats`, by default this client's
+        own. Cancelling the awaiting task aborts the HTTP request.
+        """
+        try:
+            with span("serialize") as active:
+                cleaned_history = self._clean_history(run_history)
+
+                params = dict(
+                    model=MODEL,
+                    max_tokens=1024,
+                    tools=build_tools(tuple(display_size)),
+                    messages=add_history_cache_breakpoints(cleaned_history),
+                    system=SYSTEM,
+                    betas=BETAS,
+                )
+                active.set(
+                    bytes=payload_size(run_history),
+                    images=count_images(run_history),
+                    messages=len(cleaned_history),
+                )
+
+            with span("model", stream=bool(on_text or on_coordinate)) as active:
+                start = time.perf_counter()
+                if on_text or on_coordinate:
+                    handler = StreamHandler(on_text, on_coordinate)
+                    first_event = None
+                    async with self.client.beta.messages.stream(**params) as stream:
+                        async for event in stream:
+                            if first_event is None:
+                                first_event = time.perf_counter()
+                            handler.handle(event)
+                        response = await stream.get_final_message()
+                    handler.flush()
+                else:
+                    response = await self.client.beta.messages.create(**params)
+                    first_event = None
+                usage = response.usage
+                # Only a streamed response has a first byte distinct from the end
+                ttfb_ms = None
+                if first_event is not None:
+                    ttfb_ms = round((first_event - start) * 1000, 3)
+                active.set(
+                    ttfb_ms=ttfb_ms,
+                    input_tokens=usage.input_tokens,
+                    output_tokens=usage.output_tokens,
+                    cache_read_tokens=getattr(usage, "cache_read_input_tokens", None)
+                    or 0,
+                    cache_write_tokens=getattr(
+                        usage, "cache_creation_input_tokens", None
+                    )
+                    or 0,
+                )
+            (cache_stats or self.cache_stats).record(response.usage)
 
             # If Claude responds with just text (no tool use), create a finish_run action with the message
-            has_tool_use = any(isinstance(content, BetaToolUseBlock) for content in response.content)
+            has_tool_use = any(
+                isinstance(content, BetaToolUseBlock) for content in response.content
+            )
             if not has_tool_use:
-                text_content = next((content.text for content in response.content if isinstance(content, BetaTextBlock)), "")
+                text_content = next(
+                    (
+                        content.text
+                        for content in response.content
+                        if isinstance(content, BetaTextBlock)
+                    ),
+                    "",
+                )
                 # Create a synthetic tool use block for finish_run
-                response.content.append(BetaToolUseBlock(
-                    id="synthetic_finish",
-                    type="tool_use",
-                    name="finish_run",
-                    input={
-                        "success": False,
-                        "error": f"Claude needs more information: {text_content}"
-                    }
-                ))
-                logging.info(f"Added synthetic finish_run for text-only response: {text_content}")
+                response.content.append(
+                    BetaToolUseBlock(
+                        id="synthetic_finish",
+                        type="tool_use",
+                        name="finish_run",
+                        input={
+                            "success": False,
+                            "error": f"Claude needs more information: {text_content}",
+                        },
+                    )
+                )
+                logger.info(
+                    "Added synthetic finish_run for text-only response: %s",
+                    text_content,
+                )
 
             return response
-            
+
         except anthropic.APIError as e:
             raise Exception(f"API Error: {str(e)}")
         except Exception as e:
             raise Exception(f"Unexpected error: {str(e)}")
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    """Return the process-wide AnthropicClient, creating it on first use.
+
+    Raises ValueError like AnthropicClient when no API key is configured.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = AnthropicClient()
+        return _shared_client
+
+
+def reset_shared_client():
+    """Forget the shared client, e.g. after the API key changed."""
+    global _shared_client
+    with _shared_client_lock:
+        _shared_client = None
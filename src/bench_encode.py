@@ -0,0 +1,69 @@
+"""Benchmark the screenshot encoder presets on synthetic desktop frames.
+
+Usage: python -m src.bench_encode [--width 3840 --height 2160 --frames 3]
+"""
+
+import argparse
+import base64
+import time
+
+from .encoding import PRESETS, ScreenshotEncoder
+from .geometry import DisplayGeometry
+from .synthetic import desktop_frame
+
+
+def run(width, height, frames, repeat):
+    images = [desktop_frame(width, height, seed=i) for i in range(frames)]
+    ai_size = DisplayGeometry(width, height).ai_size
+    results = []
+    for name in PRESETS:
+        encoder = ScreenshotEncoder.from_preset(name)
+        resize_times, encode_times, sizes = [], [], []
+        for image in images:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                resized = encoder.resize(image, ai_size)
+                resized_at = time.perf_counter()
+                data = base64.b64encode(encoder.encode(resized))
+                done = time.perf_counter()
+                resize_times.append(resized_at - start)
+                encode_times.append(done - resized_at)
+                sizes.append(len(data))
+        results.append(
+            (
+                name,
+                encoder.media_type,
+                1000 * sum(resize_times) / len(resize_times),
+                1000 * sum(encode_times) / len(encode_times),
+                sum(sizes) / len(sizes) / 1024,
+            )
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--frames", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ai_width, ai_height = DisplayGeometry(args.width, args.height).ai_size
+    print(
+        f"{args.frames} synthetic {args.width}x{args.height} frames -> {ai_width}x{ai_height}"
+    )
+    print(
+        f"{'preset':<12} {'type':<11} {'resize ms':>10} {'encode ms':>10} {'total ms':>9} {'base64 KiB':>11}"
+    )
+    for name, media_type, resize_ms, encode_ms, kib in run(
+        args.width, args.height, args.frames, args.repeat
+    ):
+        print(
+            f"{name:<12} {media_type:<11} {resize_ms:>10.1f} {encode_ms:>10.1f} "
+            f"{resize_ms + encode_ms:>9.1f} {kib:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Closed-loop benchmark of the agent loop on a synthetic desktop.
+
+Runs Store.run_agent_async headlessly against SyntheticDesktop screens with
+a simulated user who clicks the highlighted point after `--click-delay`
+seconds. The model is either an oracle that always points at the current
+button, a fixed script of the expected steps, or the real API.
+
+Usage: python bench.py [--tasks dark-mode wifi] [--model oracle|scripted]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from dotenv import load_dotenv
+
+from .budget import TokenBudget
+from .computer import ComputerControl
+from .history import payload_size
+from .logs import configure_logging, stop_logging
+from .replay import ReplayClient, ScriptedInput, finish, move_to
+from .synthetic import TASKS, SyntheticDesktop
+
+
+class OracleClient(ReplayClient):
+    """Model stand-in that answers from the synthetic desktop's state."""
+
+    def __init__(self, desktop, computer_control, latency=0.0):
+        super().__init__([], latency=latency)
+        self.desktop = desktop
+        self.computer_control = computer_control
+
+    async def get_next_action(self, run_history, **options):
+        target = self.desktop.target
+        if target is None:
+            self.responses.append(finish())
+        else:
+            x, y = self.computer_control.map_to_ai_space(*target)
+            label = self.desktop.labels[self.desktop.index]
+            self.responses.append(move_to(round(x), round(y), f"Click {label}."))
+        return await super().get_next_action(run_history, **options)
+
+
+class MeteredClient:
+    """Wraps a client and counts requests, payload bytes and input tokens."""
+
+    def __init__(self, client):
+        self.client = client
+        self.budget = TokenBudget()
+        self.turns = 0
+        self.bytes = 0
+        self.tokens = 0
+
+    @property
+    def cache_stats(self):
+        return self.client.cache_stats
+
+    async def get_next_action(self, run_history, **options):
+        self.turns += 1
+        self.bytes += payload_size(run_history)
+        message = await self.client.get_next_action(run_history, **options)
+        usage = message.usage
+        actual = (
+            usage.input_tokens
+            + (getattr(usage, "cache_read_input_tokens", None) or 0)
+            + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+        )
+        # Stand-in models report no usage; count what the request would cost
+        self.tokens += actual or self.budget.estimate(run_history)
+        return message
+
+
+def build_client(model, desktop, computer, latency):
+    if model == "oracle":
+        return OracleClient(desktop, computer, latency)
+    if model == "scripted":
+        steps = []
+        for index, label in enumerate(desktop.labels):
+            x, y = computer.map_to_ai_space(*desktop.target_at(index))
+            steps.append(move_to(round(x), round(y), f"Click {label}."))
+        return ReplayClient(steps + [finish()], latency=latency)
+    from .anthropic import get_shared_client
+
+    return get_shared_client()
+
+
+async def run_task(
+    name, model="oracle", width=1920, height=1080, latency=0.0, click_delay=0.2, seed=0
+):
+    """Run one synthetic task end to end and return its measurements."""
+    from .store import Store
+
+    instruction, labels = TASKS[name]
+    desktop = SyntheticDesktop(labels, width, height, seed=seed)
+    computer = ComputerControl(capture=desktop, screen_size=(width, height))
+    client = MeteredClient(build_client(model, desktop, computer, latency))
+    # Measure the loop itself: no stored sessions, and no recipes guiding
+    # repeated runs without the model
+    store = Store(
+        anthropic_client=client,
+        computer_control=computer,
+        advance_on="click",
+        stream=False,
+        sessions=None,
+        recipes=None,
+        record_dir=None,
+    )
+    store.input_listener = ScriptedInput(
+        delay=click_delay,
+        target=lambda: store.last_target,
+        on_click=lambda event: desktop.click(event.x, event.y),
+    )
+    store.set_instructions(instruction)
+
+    messages = []
+    start = time.perf_counter()
+    await store.run_agent_async(messages.append, lambda x, y: None)
+    return {
+        "task": name,
+        "success": desktop.done and not store.error,
+        "wall_time": time.perf_counter() - start,
+        "turns": client.turns,
+        "clicks": len(desktop.clicks),
+        "bytes": client.bytes,
+        "tokens": client.tokens,
+        "error": store.error,
+    }
+
+
+async def run_all(args):
+    """Run every task `args.repeat` times on one event loop.
+
+    The shared API client is bound to the loop it was first used on, so all
+    runs share a single asyncio.run.
+    """
+    results = []
+    for _ in range(args.repeat):
+        for name in args.tasks:
+            result = await run_task(
+                name,
+                args.model,
+                args.width,
+                args.height,
+                args.latency,
+                args.click_delay,
+            )
+            results.append(result)
+            if args.json:
+                print(json.dumps(result))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--tasks", nargs="+", choices=sorted(TASKS), default=sorted(TASKS)
+    )
+    parser.add_argument(
+        "--model", choices=["oracle", "scripted", "anthropic"], default="oracle"
+    )
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Simulated model latency (s)"
+    )
+    parser.add_argument(
+        "--click-delay", type=float, default=0.2, help="Seconds before each click"
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--json", action="store_true", help="Print one JSON object per run"
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    configure_logging()
+
+    try:
+        results = asyncio.run(run_all(args))
+    finally:
+        stop_logging()
+
+    if args.json:
+        return
+    print(
+        f"{args.model} model, {args.width}x{args.height}, "
+        f"click delay {args.click_delay}s"
+    )
+    print(
+        f"{'task':<12} {'ok':<4} {'wall s':>8} {'turns':>6} {'clicks':>7} "
+        f"{'KiB sent':>9} {'tokens':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['task']:<12} {'yes' if r['success'] else 'no':<4} "
+            f"{r['wall_time']:>8.2f} {r['turns']:>6} {r['clicks']:>7} "
+            f"{r['bytes'] / 1024:>9.1f} {r['tokens']:>8}"
+        )
+        if r["error"]:
+            print(f"  error: {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
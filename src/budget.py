@@ -0,0 +1,190 @@
+import base64
+import io
+import logging
+import os
+import struct
+
+from PIL import Image
+
+from .anthropic import SYSTEM_PROMPT
+from .history import HistoryPolicy
+
+logger = logging.getLogger(__name__)
+
+# The computer-use beta adds its own system prompt and tool description on
+# top of ours; roughly 1.2k tokens according to the published figures
+TOOL_OVERHEAD_TOKENS = 1200
+CHARS_PER_TOKEN = 4
+PIXELS_PER_TOKEN = 750
+
+# Successively cheaper screenshot settings tried once trimming is not enough
+DEGRADE_STEPS = [
+    {"image_scale": 0.75},
+    {"image_scale": 0.5},
+    {"image_scale": 0.5, "foveated": True},
+]
+# Fraction of the limit at which the next degrade step is taken
+DEGRADE_AT = 0.8
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class TokenBudget:
+    """Keeps each request, and the run as a whole, under a token budget.
+
+    Before every model call the pending request is estimated, from image
+    sizes and text length or with the count_tokens endpoint when
+    `use_count_tokens` is set. If it would exceed the per-turn budget (or
+    what is left of the per-run budget) the history is trimmed harder. If
+    it is still close to the limit, later screenshots are taken at a lower
+    resolution and finally as a foveated crop; a request that does not fit
+    raises BudgetExceeded rather than being sent. Actual usage is recorded
+    after each response so the per-run budget tracks real spend.
+    """
+
+    def __init__(self, per_turn=None, per_run=None, use_count_tokens=False):
+        self.per_turn = per_turn
+        self.per_run = per_run
+        self.use_count_tokens = use_count_tokens
+        self.spent = 0
+        self.degrade_level = 0
+        self._sizes = {}
+
+    @classmethod
+    def from_env(cls):
+        per_turn = int(os.getenv("TOKEN_BUDGET_PER_TURN", "12000")) or None
+        per_run = int(os.getenv("TOKEN_BUDGET_PER_RUN", "0")) or None
+        return cls(
+            per_turn=per_turn,
+            per_run=per_run,
+            use_count_tokens=os.getenv("TOKEN_BUDGET_COUNT_TOKENS", "0") == "1",
+        )
+
+    def reset(self):
+        self.spent = 0
+        self.degrade_level = 0
+
+    @property
+    def limit(self):
+        limits = [self.per_turn] if self.per_turn else []
+        if self.per_run:
+            limits.append(self.per_run - self.spent)
+        return min(limits) if limits else None
+
+    def record(self, usage):
+        self.spent += (
+            usage.input_tokens
+            + (getattr(usage, "cache_read_input_tokens", None) or 0)
+            + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+        )
+
+    async def enforce(self, run_history, history_policy, computer_control, client=None):
+        """Shrink the pending request until it fits; returns the estimate."""
+        limit = self.limit
+        if limit is not None and limit <= 0:
+            raise BudgetExceeded(
+                f"Token budget for this run is used up ({self.spent} tokens)"
+            )
+
+        display_size = computer_control.ai_size
+        estimate = await self.measure(run_history, client, display_size)
+        if limit is None or estimate <= limit:
+            logger.info("Estimated request size: %d tokens", estimate)
+            return estimate
+
+        # Trim in the policy's batches first so the cached prefix survives
+        # the following turns; cutting single screenshots is the last resort
+        for trim_batch in (history_policy.trim_batch, 0):
+            keep = history_policy.max_screenshots - 1
+            while estimate > limit and keep >= 1:
+                policy = HistoryPolicy(max_screenshots=keep, trim_batch=trim_batch)
+                if policy.apply(run_history):
+                    estimate = await self.measure(run_history, client, display_size)
+                keep -= 1
+
+        # A request that only just fits after trimming makes later
+        # screenshots cheaper, before trimming alone stops being enough
+        if estimate > limit * DEGRADE_AT and self.degrade_level < len(DEGRADE_STEPS):
+            step = DEGRADE_STEPS[self.degrade_level]
+            self.degrade_level += 1
+            computer_control.image_scale = step["image_scale"]
+            if step.get("foveated"):
+                computer_control.foveated = True
+            logger.info("Token budget: next screenshots use %s", step)
+
+        if estimate > limit:
+            raise BudgetExceeded(
+                f"The next request needs about {estimate} tokens, "
+                f"over the budget of {limit}"
+            )
+        logger.info(
+            "Estimated request size after budgeting: %d tokens (limit %d)",
+            estimate,
+            limit,
+        )
+        return estimate
+
+    async def measure(self, run_history, client=None, display_size=(1280, 800)):
+        if (
+            self.use_count_tokens
+            and client is not None
+            and hasattr(client, "count_tokens")
+        ):
+            try:
+                return await client.count_tokens(run_history, display_size)
+            except Exception as e:
+                logger.info("count_tokens failed, using local estimate: %s", e)
+        return self.estimate(run_history)
+
+    def estimate(self, run_history):
+        """Local token estimate: text length plus image area."""
+        tokens = TOOL_OVERHEAD_TOKENS + len(SYSTEM_PROMPT) // CHARS_PER_TOKEN
+        for message in run_history:
+            if isinstance(message, dict):
+                tokens += self._content_tokens(message.get("content"))
+            else:
+                for block in message.content:
+                    text = getattr(block, "text", None) or str(
+                        getattr(block, "input", "")
+                    )
+                    tokens += len(text) // CHARS_PER_TOKEN
+        return tokens
+
+    def _content_tokens(self, content):
+        if isinstance(content, str):
+            return len(content) // CHARS_PER_TOKEN
+        if not isinstance(content, list):
+            return 0
+        tokens = 0
+        for block in content:
+            if not isinstance(block, dict):
+                continue
+            if block.get("type") == "text":
+                tokens += len(block.get("text", "")) // CHARS_PER_TOKEN
+            elif block.get("type") == "image":
+                width, height = self.image_size(block["source"])
+                tokens += width * height // PIXELS_PER_TOKEN
+            elif block.get("type") == "tool_result":
+                tokens += self._content_tokens(block.get("content"))
+        return tokens
+
+    def image_size(self, source):
+        if source.get("type") == "blob":
+            return source["width"], source["height"]
+        data = source.get("data", "")
+        key = (len(data), data[-64:])
+        if key not in self._sizes:
+            self._sizes[key] = _image_size(data)
+        return self._sizes[key]
+
+
+def _image_size(data):
+    # PNG keeps its dimensions at a fixed offset in the IHDR chunk, so only
+    # the first 24 bytes need decoding
+    head = base64.b64decode(data[:32])
+    if head.startswith(b"\x89PNG"):
+        return struct.unpack(">II", head[16:24])
+    with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+        return image.size
@@ -0,0 +1,346 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import platform
+import threading
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class CaptureError(Exception):
+    pass
+
+
+class PyAutoGUICapture:
+    """Portable fallback; on Linux this shells out to a screenshot tool."""
+
+    name = "pyautogui"
+
+    def grab(self):
+        import pyautogui
+
+        return pyautogui.screenshot()
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class XlibCapture:
+    """Grabs the root window over one persistent python-xlib connection."""
+
+    name = "xlib"
+
+    def __init__(self):
+        from Xlib import display
+
+        self._display_module = display
+        self.display = None
+        self.lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        self.display = self._display_module.Display()
+        self.root = self.display.screen().root
+
+    def grab(self):
+        from Xlib import X
+
+        with self.lock:
+            if self.display is None:
+                self._connect()
+            geometry = self.root.get_geometry()
+            raw = self.root.get_image(
+                0, 0, geometry.width, geometry.height, X.ZPixmap, ALL_PLANES
+            )
+            return Image.frombytes(
+                "RGB", (geometry.width, geometry.height), raw.data, "raw", "BGRX"
+            )
+
+    def reset(self):
+        with self.lock:
+            self.close()
+
+    def close(self):
+        if self.display is not None:
+            self.display.close()
+            self.display = None
+
+
+class _XImage(ctypes.Structure):
+    # Only the leading fields are read; the struct is always allocated by Xlib
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+_X_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+class ShmCapture:
+    """MIT-SHM capture through libX11/libXext.
+
+    One display connection and one shared-memory segment are kept for the
+    lifetime of the object, so a grab is a single XShmGetImage into memory
+    that is already mapped, plus the BGRX to RGB conversion.
+    """
+
+    name = "shm"
+
+    def __init__(self):
+        x11_path = ctypes.util.find_library("X11")
+        xext_path = ctypes.util.find_library("Xext")
+        libc_path = ctypes.util.find_library("c")
+        if not x11_path or not xext_path:
+            raise CaptureError("libX11/libXext not found")
+
+        self.x11 = ctypes.CDLL(x11_path)
+        self.xext = ctypes.CDLL(xext_path)
+        self.libc = ctypes.CDLL(libc_path, use_errno=True)
+        self._declare()
+
+        self.lock = threading.Lock()
+        self.x_error = None
+        # Without a handler a failed XShmAttach (e.g. on a remote display)
+        # would terminate the process
+        self._error_handler = _X_ERROR_HANDLER(self._on_x_error)
+        self.x11.XSetErrorHandler(self._error_handler)
+
+        self.display = None
+        self.image = None
+        self.shminfo = None
+        self._connect()
+
+    def _declare(self):
+        x11, xext, libc = self.x11, self.xext, self.libc
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.restype = ctypes.c_int
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultDepth.restype = ctypes.c_int
+        x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayWidth.restype = ctypes.c_int
+        x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayHeight.restype = ctypes.c_int
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSetErrorHandler.argtypes = [_X_ERROR_HANDLER]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(_XImage)]
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmQueryExtension.restype = ctypes.c_int
+        xext.XShmCreateImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_uint,
+            ctypes.c_int,
+            ctypes.c_void_p,
+            ctypes.POINTER(_XShmSegmentInfo),
+            ctypes.c_uint,
+            ctypes.c_uint,
+        ]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmAttach.restype = ctypes.c_int
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_ulong,
+            ctypes.POINTER(_XImage),
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_ulong,
+        ]
+        xext.XShmGetImage.restype = ctypes.c_int
+
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmget.restype = ctypes.c_int
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    def _on_x_error(self, display, event):
+        self.x_error = "X protocol error during shared-memory capture"
+        return 0
+
+    def _connect(self):
+        display = self.x11.XOpenDisplay(None)
+        if not display:
+            raise CaptureError("Cannot open X display")
+        self.display = display
+        try:
+            if not self.xext.XShmQueryExtension(display):
+                raise CaptureError("MIT-SHM extension not available")
+
+            screen = self.x11.XDefaultScreen(display)
+            self.root = self.x11.XDefaultRootWindow(display)
+            width = self.x11.XDisplayWidth(display, screen)
+            height = self.x11.XDisplayHeight(display, screen)
+
+            self.shminfo = _XShmSegmentInfo()
+            image = self.xext.XShmCreateImage(
+                display,
+                self.x11.XDefaultVisual(display, screen),
+                self.x11.XDefaultDepth(display, screen),
+                ZPIXMAP,
+                None,
+                ctypes.byref(self.shminfo),
+                width,
+                height,
+            )
+            if not image:
+                raise CaptureError("XShmCreateImage failed")
+            self.image = image
+            if image.contents.bits_per_pixel != 32:
+                raise CaptureError(
+                    f"Unsupported pixel format: {image.contents.bits_per_pixel} bpp"
+                )
+
+            size = image.contents.bytes_per_line * height
+            shmid = self.libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+            if shmid < 0:
+                raise CaptureError(f"shmget failed: errno {ctypes.get_errno()}")
+            self.shminfo.shmid = shmid
+            address = self.libc.shmat(shmid, None, 0)
+            if address in (None, ctypes.c_void_p(-1).value):
+                self.libc.shmctl(shmid, IPC_RMID, None)
+                self.shminfo.shmaddr = None
+                raise CaptureError(f"shmat failed: errno {ctypes.get_errno()}")
+            self.shminfo.shmaddr = address
+            self.shminfo.readOnly = 0
+            image.contents.data = address
+
+            self.x_error = None
+            self.xext.XShmAttach(display, ctypes.byref(self.shminfo))
+            self.x11.XSync(display, 0)
+            # Marked for removal now; the kernel frees it once both sides detach
+            self.libc.shmctl(shmid, IPC_RMID, None)
+            if self.x_error:
+                raise CaptureError(self.x_error)
+
+            self.width, self.height = width, height
+            self.buffer = (ctypes.c_char * size).from_address(address)
+            self.attached = True
+        except Exception:
+            self.attached = False
+            self.close()
+            raise
+
+    def grab(self):
+        with self.lock:
+            if self.display is None:
+                self._connect()
+            self.x_error = None
+            ok = self.xext.XShmGetImage(
+                self.display, self.root, self.image, 0, 0, ALL_PLANES
+            )
+            if not ok or self.x_error:
+                raise CaptureError(self.x_error or "XShmGetImage failed")
+            # frombuffer with a raw BGRX decoder copies, so the shared buffer
+            # can be reused by the next grab
+            return Image.frombuffer(
+                "RGB",
+                (self.width, self.height),
+                self.buffer,
+                "raw",
+                "BGRX",
+                self.image.contents.bytes_per_line,
+                1,
+            )
+
+    def reset(self):
+        """Drop the connection; the next grab picks up the new screen size."""
+        with self.lock:
+            self.close()
+
+    def close(self):
+        if self.display is None:
+            return
+        if self.shminfo is not None and self.shminfo.shmaddr:
+            if getattr(self, "attached", False):
+                self.xext.XShmDetach(self.display, ctypes.byref(self.shminfo))
+                self.x11.XSync(self.display, 0)
+            self.libc.shmdt(self.shminfo.shmaddr)
+            self.shminfo.shmaddr = None
+        if self.image:
+            # The pixels live in shared memory, not in Xlib's heap
+            self.image.contents.data = None
+            self.x11.XDestroyImage(self.image)
+            self.image = None
+        self.x11.XCloseDisplay(self.display)
+        self.display = None
+        self.attached = False
+
+
+BACKENDS = {
+    "shm": ShmCapture,
+    "xlib": XlibCapture,
+    "pyautogui": PyAutoGUICapture,
+}
+
+
+def create_capture_backend(name=None):
+    """Pick the fastest capture backend that works on this machine.
+
+    CAPTURE_BACKEND can force "shm", "xlib" or "pyautogui"; the default
+    "auto" tries them in that order on Linux and uses pyautogui elsewhere.
+    """
+    name = name or os.getenv("CAPTURE_BACKEND", "auto")
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown capture backend: {name}")
+        return BACKENDS[name]()
+
+    candidates = ["pyautogui"]
+    if platform.system().lower() == "linux" and os.getenv("DISPLAY"):
+        candidates = ["shm", "xlib", "pyautogui"]
+
+    for candidate in candidates:
+        try:
+            backend = BACKENDS[candidate]()
+            logger.info("Using %s screen capture backend", candidate)
+            return backend
+        except Exception as e:
+            logger.info("%s capture backend unavailable: %s", candidate, e)
+    return PyAutoGUICapture()
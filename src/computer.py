@@ -1,16 +1,75 @@
 import base64
-import io
+import os
 
-import pyautogui
-from PIL import Image
+from .capture import create_capture_backend
+from .encoding import ScreenshotEncoder
+from .fingerprint import EncodedFrameCache, fingerprint, same_frame
+from .geometry import DisplayGeometry
+from .tracing import span
 
 
 class ComputerControl:
-    def __init__(self):
-        self.screen_width, self.screen_height = pyautogui.size()
-        pyautogui.PAUSE = 0.5  # Add a small delay between actions for stability
+    def __init__(self, encoder=None, capture=None, foveated=None, screen_size=None):
+        # pyautogui needs a live display at import time, so it is only loaded
+        # when this instance is going to drive the real screen
+        self.headless = screen_size is not None
+        if not self.headless:
+            import pyautogui
+
+            pyautogui.PAUSE = 0.5  # Add a small delay between actions for stability
+        self.geometry = None
+        self.refresh_geometry(screen_size)
+        self._frame_size = None
+        self.encoder = encoder or ScreenshotEncoder.from_preset(
+            os.getenv("SCREENSHOT_ENCODER", "png")
+        )
+        self.capture = capture or create_capture_backend()
+        if foveated is None:
+            foveated = os.getenv("FOVEATED_SCREENSHOTS", "0") == "1"
+        self.foveated = foveated
+        self.thumbnail_scale = int(os.getenv("FOVEA_THUMBNAIL_SCALE", "3"))
+        self.fovea_size = (400, 300)
+        self.last_target = None  # Last mouse_move target in AI space
+        # Fraction of the AI resolution screenshots are sent at; lowered by
+        # the token budget when requests get too large
+        self.image_scale = 1.0
+        # SessionStore that keeps screenshots on disk; None sends them inline
+        self.image_store = None
+        # "exact" or "perceptual" reports an unchanged screen as text instead
+        # of sending the same image again; "off" always sends the image
+        self.frame_dedup = os.getenv("FRAME_DEDUP", "exact")
+        self.frame_dedup_distance = int(os.getenv("FRAME_DEDUP_DISTANCE", "4"))
+        self.frame_cache = EncodedFrameCache(int(os.getenv("FRAME_CACHE_SIZE", "16")))
+        self.last_fingerprint = None  # Of the last full screenshot sent
+        # Most recent frame from grab(): the screen as the model last saw it,
+        # before any highlight for its answer was shown
+        self.last_frame = None
         self.position_callback = None  # Add callback for position updates
 
+    def refresh_geometry(self, screen_size=None):
+        """Recompute the AI coordinate space, e.g. after a display change."""
+        if screen_size is None:
+            if self.headless:
+                screen_size = self.geometry.screen_size
+            else:
+                import pyautogui
+
+                screen_size = tuple(pyautogui.size())
+        if self.geometry is not None and self.geometry.matches(*screen_size):
+            return False
+        self.geometry = DisplayGeometry(*screen_size)
+        self.screen_width, self.screen_height = screen_size
+        return True
+
+    def on_display_changed(self):
+        """Pick up a new resolution for capture, mapping and the tool schema."""
+        self.capture.reset()
+        self.refresh_geometry()
+
+    @property
+    def ai_size(self):
+        return self.geometry.ai_size
+
     def set_position_callback(self, callback):
         """Set the callback for position updates"""
         self.position_callback = callback
@@ -19,10 +78,12 @@ class ComputerControl:
         action_type = action["type"]
 
         if action_type == "mouse_move":
+            self.last_target = (action["x"], action["y"])
             x, y = self.map_from_ai_space(action["x"], action["y"])
-            print(f"Nicolas {x}")
-            print(f"Nicolas{y}")
-            pyautogui.moveTo(x, y)
+            if not self.headless:
+                import pyautogui
+
+                pyautogui.moveTo(x, y)
             self.position_callback(int(x), int(y))
         elif action_type == "left_click":
             return
@@ -46,20 +107,188 @@ class ComputerControl:
         else:
             raise ValueError(f"Unsupported action: {action_type}")
 
-    def take_screenshot(self):
-        screenshot = pyautogui.screenshot()
-        ai_screenshot = self.resize_for_ai(screenshot)
-        buffered = io.BytesIO()
-        ai_screenshot.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode("utf-8")
+    def preview_position(self, x, y):
+        """Show the highlight at an AI-space point without moving the cursor."""
+        if self.position_callback:
+            screen_x, screen_y = self.map_from_ai_space(x, y)
+            self.position_callback(int(screen_x), int(screen_y))
+
+    def grab(self):
+        """Capture the full screen as a PIL image."""
+        with span("capture", backend=self.capture.name) as active:
+            image = self.capture.grab()
+            active.set(width=image.width, height=image.height)
+        if self._frame_size is not None and image.size != self._frame_size:
+            # Resolution changed under us (monitor swap, scaling change)
+            self.refresh_geometry(image.size if self.headless else None)
+        self._frame_size = image.size
+        self.last_frame = image
+        return image
+
+    def screenshot_block(self):
+        """An image block for the current screen."""
+        return self.prepared_block(*self.prepare_screenshot())
+
+    def prepare_screenshot(self):
+        """Capture, resize and encode the screen without storing it.
+
+        Returns (resized image, fingerprint) for prepared_block; the encoded
+        bytes wait in frame_cache, so nothing is written to the image_store
+        until the block is actually used.
+        """
+        resized, frame_fingerprint = self._prepare(self.grab(), self.screenshot_size)
+        self._encoded(resized, frame_fingerprint)
+        return resized, frame_fingerprint
+
+    def prepared_block(self, resized, frame_fingerprint):
+        """The image block for a prepare_screenshot result."""
+        self.last_fingerprint = frame_fingerprint
+        return self._block(resized, frame_fingerprint)
+
+    def current_fingerprint(self):
+        """Fingerprint of the screen as it would be sent right now."""
+        return self._prepare(self.grab(), self.screenshot_size)[1]
+
+    def encode_block(self, image, size):
+        """Encode `image` at `size` as an image block.
+
+        With an image_store the bytes go to disk and the block only refers
+        to them; otherwise the block carries the base64 data inline.
+        """
+        return self._block(*self._prepare(image, size))
+
+    def _prepare(self, image, size):
+        with span("resize", filter=self.encoder.resample) as active:
+            resized = self.encoder.resize(image, size)
+            active.set(width=resized.width, height=resized.height)
+        with span("fingerprint"):
+            return resized, fingerprint(resized)
+
+    def _encoded(self, resized, frame_fingerprint):
+        # Identical pixels encode to identical bytes, so reuse them
+        key = (frame_fingerprint.digest, self.encoder.settings)
+        data = self.frame_cache.get(key)
+        if data is None:
+            data, _ = self.encoder.to_bytes(resized, resized.size)
+            self.frame_cache.put(key, data)
+        return data
+
+    def _block(self, resized, frame_fingerprint):
+        data = self._encoded(resized, frame_fingerprint)
+        if self.image_store is not None:
+            return self.image_store.put_image(
+                data, self.encoder.media_type, resized.size
+            )
+        with span("base64"):
+            return self.image_block(base64.b64encode(data).decode("utf-8"))
+
+    @property
+    def screenshot_size(self):
+        ai_width, ai_height = self.ai_size
+        return (
+            round(ai_width * self.image_scale),
+            round(ai_height * self.image_scale),
+        )
+
+    def image_block(self, data):
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": self.encoder.media_type,
+                "data": data,
+            },
+        }
+
+    def screenshot_content(self, foveated=None):
+        """Content blocks showing the current screen, for a tool_result.
+
+        If the screen is the same as in the last screenshot sent, a short
+        text block replaces the image. `foveated` overrides self.foveated
+        for this screenshot.
+        """
+        frame = self.grab()
+        resized, frame_fingerprint = self._prepare(frame, self.screenshot_size)
+        if self.frame_dedup != "off" and same_frame(
+            frame_fingerprint,
+            self.last_fingerprint,
+            self.frame_dedup_distance if self.frame_dedup == "perceptual" else None,
+        ):
+            return [
+                {
+                    "type": "text",
+                    "text": (
+                        "The action was executed. The screen is unchanged since "
+                        "the previous screenshot."
+                    ),
+                }
+            ]
+        self.last_fingerprint = frame_fingerprint
+
+        if foveated is None:
+            foveated = self.foveated
+        if foveated and self.last_target is not None:
+            return self.take_foveated_screenshot(frame)
+        text = "Here is a screenshot after the action was executed"
+        if self.image_scale != 1.0:
+            width, height = self.screenshot_size
+            ai_width, ai_height = self.ai_size
+            text += (
+                f". It is shown at {width}x{height}; multiply positions in it by "
+                f"{1 / self.image_scale:.3g} to get {ai_width}x{ai_height} "
+                "screen coordinates"
+            )
+        return [
+            {"type": "text", "text": text},
+            self._block(resized, frame_fingerprint),
+        ]
+
+    def take_foveated_screenshot(self, frame=None):
+        """A low-resolution overview plus a full-scale crop around the target.
+
+        Both images are cut from the same AI-space frame, and the text tells
+        the model how to convert positions back into AI space so that
+        map_from_ai_space keeps working unchanged.
+        """
+        frame = self.resize_for_ai(frame if frame is not None else self.grab())
+        ai_width, ai_height = self.ai_size
+        scale = self.thumbnail_scale
+        thumb_size = (ai_width // scale, ai_height // scale)
+        thumbnail = frame.resize(thumb_size)
+
+        box = self.fovea_box(self.last_target)
+        detail = frame.crop(box)
+        x0, y0, x1, y1 = box
+        return [
+            {
+                "type": "text",
+                "text": (
+                    "Here is the screen after the action was executed. "
+                    f"The first image is the whole {ai_width}x{ai_height} screen "
+                    f"shrunk {scale}x to {thumb_size[0]}x{thumb_size[1]}: multiply "
+                    f"positions in it by {scale}. The second image is the region "
+                    f"from ({x0}, {y0}) to ({x1}, {y1}) around your last target at "
+                    f"full scale: add ({x0}, {y0}) to positions in it. Always give "
+                    f"coordinates in the full {ai_width}x{ai_height} screen space."
+                ),
+            },
+            self.encode_block(thumbnail, thumb_size),
+            self.encode_block(detail, detail.size),
+        ]
+
+    def fovea_box(self, target):
+        ai_width, ai_height = self.ai_size
+        width = min(self.fovea_size[0], ai_width)
+        height = min(self.fovea_size[1], ai_height)
+        x = min(max(int(target[0]) - width // 2, 0), ai_width - width)
+        y = min(max(int(target[1]) - height // 2, 0), ai_height - height)
+        return (x, y, x + width, y + height)
 
     def map_from_ai_space(self, x, y):
-        ai_width, ai_height = 1280, 800
-        return (x * self.screen_width / ai_width, y * self.screen_height / ai_height)
+        return self.geometry.to_screen(x, y)
 
     def map_to_ai_space(self, x, y):
-        ai_width, ai_height = 1280, 800
-        return (x * ai_width / self.screen_width, y * ai_height / self.screen_height)
+        return self.geometry.to_ai(x, y)
 
     def resize_for_ai(self, screenshot):
-        return screenshot.resize((1280, 800), Image.LANCZOS)
+        return self.encoder.resize(screenshot, self.ai_size)
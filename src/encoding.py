@@ -0,0 +1,131 @@
+import io
+import logging
+
+from PIL import Image
+
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+RESAMPLE_FILTERS = {
+    "lanczos": Image.Resampling.LANCZOS,
+    "bicubic": Image.Resampling.BICUBIC,
+    "bilinear": Image.Resampling.BILINEAR,
+    "box": Image.Resampling.BOX,
+    "nearest": Image.Resampling.NEAREST,
+}
+
+MEDIA_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+}
+
+
+class ScreenshotEncoder:
+    """Resizes and encodes screenshots for the model.
+
+    The defaults reproduce the original behaviour (LANCZOS resize and a
+    lossless PNG). The other knobs trade fidelity for speed and size:
+
+    - `resample`: a cheaper filter such as "bilinear" or "box"
+    - `quantize_colors`: palette-quantize before a PNG encode
+    - `format` and `quality`: lossy JPEG or WebP
+    - `reduce_first`: integer box-reduce big frames before the final resize
+    """
+
+    def __init__(
+        self,
+        format="PNG",
+        quality=80,
+        resample="lanczos",
+        quantize_colors=None,
+        reduce_first=False,
+        compress_level=6,
+    ):
+        format = format.upper()
+        if format not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported screenshot format: {format}")
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"Unsupported resample filter: {resample}")
+        self.format = format
+        self.quality = quality
+        self.resample = resample
+        self.quantize_colors = quantize_colors
+        self.reduce_first = reduce_first
+        self.compress_level = compress_level
+
+    @classmethod
+    def from_preset(cls, name):
+        if name not in PRESETS:
+            raise ValueError(
+                f"Unknown screenshot encoder preset: {name} "
+                f"(choose from {', '.join(PRESETS)})"
+            )
+        return cls(**PRESETS[name])
+
+    @property
+    def media_type(self):
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def settings(self):
+        """Everything besides the pixels that affects the encoded bytes."""
+        return (self.format, self.quality, self.quantize_colors, self.compress_level)
+
+    def resize(self, image, size):
+        if image.size == tuple(size):
+            return image
+        if self.reduce_first:
+            factor = min(image.width // size[0], image.height // size[1])
+            if factor >= 2:
+                image = image.reduce(factor)
+        return image.resize(size, RESAMPLE_FILTERS[self.resample])
+
+    def encode(self, image):
+        """Encode an already-resized image and return the raw bytes."""
+        buffered = io.BytesIO()
+        if self.format == "PNG":
+            if self.quantize_colors:
+                image = image.convert("RGB").quantize(
+                    self.quantize_colors, method=Image.Quantize.FASTOCTREE
+                )
+            image.save(buffered, format="PNG", compress_level=self.compress_level)
+        elif self.format == "JPEG":
+            image.convert("RGB").save(buffered, format="JPEG", quality=self.quality)
+        else:
+            image.save(buffered, format="WEBP", quality=self.quality, method=4)
+        return buffered.getvalue()
+
+    def to_bytes(self, image, size):
+        """Resize and encode; returns (raw bytes, final size)."""
+        with span("resize", filter=self.resample) as active:
+            resized = self.resize(image, size)
+            active.set(width=resized.width, height=resized.height)
+        with span("encode", format=self.format) as active:
+            data = self.encode(resized)
+            active.set(bytes=len(data))
+        return data, resized.size
+
+
+PRESETS = {
+    "png": {},
+    "png-fast": {"resample": "bilinear", "reduce_first": True, "compress_level": 1},
+    "png-palette": {
+        "resample": "bilinear",
+        "reduce_first": True,
+        "quantize_colors": 128,
+    },
+    "jpeg": {
+        "format": "JPEG",
+        "quality": 80,
+        "resample": "bilinear",
+        "reduce_first": True,
+    },
+    "webp": {
+        "format": "WEBP",
+        "quality": 80,
+        "resample": "bilinear",
+        "reduce_first": True,
+    },
+}
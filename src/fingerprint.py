@@ -0,0 +1,66 @@
+import hashlib
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from PIL import Image
+
+# `digest` identifies the exact pixels; `dhash` is a 256-bit difference hash
+# that tolerates small changes such as a ticking clock
+Fingerprint = namedtuple("Fingerprint", ["digest", "dhash"])
+
+HASH_SIZE = 16
+
+
+def fingerprint(image):
+    """Fingerprint an (already resized) frame."""
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16).hexdigest()
+    gray = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    dhash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return Fingerprint(digest, dhash)
+
+
+def distance(a, b):
+    """Number of differing dHash bits between two fingerprints."""
+    return bin(a.dhash ^ b.dhash).count("1")
+
+
+def same_frame(a, b, max_distance=None):
+    """True if two fingerprints show the same screen.
+
+    Without `max_distance` only identical pixels match; with it, frames whose
+    dHashes differ in at most that many bits match too.
+    """
+    if a is None or b is None:
+        return False
+    if a.digest == b.digest:
+        return True
+    return max_distance is not None and distance(a, b) <= max_distance
+
+
+class EncodedFrameCache:
+    """Small LRU of encoded screenshot bytes keyed by fingerprint digest."""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = data
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
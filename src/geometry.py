@@ -0,0 +1,73 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Resolutions the computer-use model is tuned for, smallest first
+AI_RESOLUTIONS = [
+    ("XGA", 1024, 768),  # 4:3
+    ("WXGA", 1280, 800),  # 16:10
+    ("FWXGA", 1366, 768),  # ~16:9
+]
+ASPECT_TOLERANCE = 0.02
+
+
+class DisplayGeometry:
+    """The one mapping between real screen pixels and the model's pixels.
+
+    The AI resolution is the smallest standard size whose aspect ratio
+    matches the screen. A screen with an unusual aspect ratio keeps its own
+    ratio, scaled so it fits inside the largest standard size. Screens smaller
+    than the chosen size are never upscaled. The tool schema, the screenshot
+    resize and the coordinate mapping all read from the same instance.
+    """
+
+    def __init__(self, screen_width, screen_height):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.name, self.ai_width, self.ai_height = self._choose(
+            screen_width, screen_height
+        )
+        logger.info(
+            "Display %dx%d -> AI space %dx%d (%s)",
+            screen_width,
+            screen_height,
+            self.ai_width,
+            self.ai_height,
+            self.name,
+        )
+
+    @staticmethod
+    def _choose(width, height):
+        aspect = width / height
+        for name, ai_width, ai_height in AI_RESOLUTIONS:
+            if abs(ai_width / ai_height - aspect) / aspect <= ASPECT_TOLERANCE:
+                if width <= ai_width and height <= ai_height:
+                    return "native", width, height
+                return name, ai_width, ai_height
+
+        _, max_width, max_height = AI_RESOLUTIONS[-1]
+        scale = min(max_width / width, max_height / height, 1.0)
+        return "scaled", round(width * scale), round(height * scale)
+
+    @property
+    def ai_size(self):
+        return (self.ai_width, self.ai_height)
+
+    @property
+    def screen_size(self):
+        return (self.screen_width, self.screen_height)
+
+    def to_screen(self, x, y):
+        return (
+            x * self.screen_width / self.ai_width,
+            y * self.screen_height / self.ai_height,
+        )
+
+    def to_ai(self, x, y):
+        return (
+            x * self.ai_width / self.screen_width,
+            y * self.ai_height / self.screen_height,
+        )
+
+    def matches(self, screen_width, screen_height):
+        return (screen_width, screen_height) == self.screen_size
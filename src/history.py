@@ -0,0 +1,154 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+STUB_PREFIX = "[Screenshot from step"
+
+
+class HistoryPolicy:
+    """Keeps only the most recent screenshots in the run history.
+
+    Older images are swapped for a short text stub so the model still knows a
+    screenshot existed at that step, without resending the pixels every turn.
+
+    Every trim rewrites earlier messages and so invalidates the prompt cache
+    from that point on. With `trim_batch` the history is allowed to grow to
+    `max_screenshots + trim_batch` images before it is cut back down to
+    `max_screenshots`, so the cached prefix survives several turns in a row.
+    """
+
+    def __init__(self, max_screenshots=3, trim_batch=0):
+        if max_screenshots < 1:
+            raise ValueError("max_screenshots must be at least 1")
+        if trim_batch < 0:
+            raise ValueError("trim_batch must not be negative")
+        self.max_screenshots = max_screenshots
+        self.trim_batch = trim_batch
+
+    def apply(self, run_history):
+        """Stub out all but the last `max_screenshots` screenshots in place.
+
+        A screenshot is one step's worth of images, so a foveated capture
+        (overview plus detail crop) counts once. Returns the number of
+        screenshots that were replaced.
+        """
+        steps = [step for step in self._steps(run_history) if step[2]]
+        if len(steps) <= self.max_screenshots + self.trim_batch:
+            return 0
+        excess = len(steps) - self.max_screenshots
+
+        for blocks, number, _ in steps[:excess]:
+            stub = {
+                "type": "text",
+                "text": f"{STUB_PREFIX} {number} omitted to save context]",
+            }
+            kept = []
+            for block in blocks:
+                if isinstance(block, dict) and block.get("type") == "image":
+                    if stub is not None:
+                        kept.append(stub)
+                        stub = None
+                else:
+                    kept.append(block)
+            blocks[:] = kept
+        logger.debug("Replaced %d old screenshots with text stubs", excess)
+        return excess
+
+    def _steps(self, run_history):
+        """Yield (blocks, step, has_images) for every screenshot position.
+
+        Steps are numbered in the order screenshots were added to the history,
+        counting both live images and stubs left behind by earlier trims.
+        """
+        step = 0
+        for message in run_history:
+            if not isinstance(message, dict):
+                continue
+            for blocks in self._content_lists(message.get("content")):
+                has_images = any(
+                    isinstance(block, dict) and block.get("type") == "image"
+                    for block in blocks
+                )
+                has_stub = any(
+                    isinstance(block, dict)
+                    and block.get("type") == "text"
+                    and block.get("text", "").startswith(STUB_PREFIX)
+                    for block in blocks
+                )
+                if has_images or has_stub:
+                    step += 1
+                    yield blocks, step, has_images
+
+    def _content_lists(self, content):
+        if not isinstance(content, list):
+            return
+        yield content
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "tool_result":
+                nested = block.get("content")
+                if isinstance(nested, list):
+                    yield nested
+
+
+def payload_size(run_history):
+    """Approximate request payload in bytes: text plus base64 image data."""
+    total = 0
+    for message in run_history:
+        if isinstance(message, dict):
+            total += _content_size(message.get("content"))
+        else:
+            # BetaMessage from a previous turn
+            for block in message.content:
+                text = getattr(block, "text", None)
+                if text:
+                    total += len(text.encode("utf-8"))
+                tool_input = getattr(block, "input", None)
+                if tool_input:
+                    total += len(str(tool_input))
+    return total
+
+
+def count_images(run_history):
+    """Number of image blocks that will be sent with the request."""
+    total = 0
+    for message in run_history:
+        if isinstance(message, dict):
+            total += _content_images(message.get("content"))
+    return total
+
+
+def _content_images(content):
+    if not isinstance(content, list):
+        return 0
+    total = 0
+    for block in content:
+        if not isinstance(block, dict):
+            continue
+        if block.get("type") == "image":
+            total += 1
+        elif block.get("type") == "tool_result":
+            total += _content_images(block.get("content"))
+    return total
+
+
+def _content_size(content):
+    if isinstance(content, str):
+        return len(content.encode("utf-8"))
+    if not isinstance(content, list):
+        return 0
+    total = 0
+    for block in content:
+        if not isinstance(block, dict):
+            continue
+        if block.get("type") == "text":
+            total += len(block.get("text", "").encode("utf-8"))
+        elif block.get("type") == "image":
+            source = block.get("source", {})
+            if source.get("type") == "blob":
+                # Stored on disk; count what it will be once base64-encoded
+                total += 4 * ((source["bytes"] + 2) // 3)
+            else:
+                total += len(source.get("data", ""))
+        elif block.get("type") == "tool_result":
+            total += _content_size(block.get("content"))
+    return total
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+ClickEvent = namedtuple("ClickEvent", ["x", "y", "button", "timestamp"])
+
+_CANCELLED = object()
+
+
+class InputListener:
+    """Process-wide global mouse listener.
+
+    pynput runs one background thread for the life of the process (XRecord on
+    Linux, a Quartz event tap on macOS) and every button press is queued as a
+    timestamped ClickEvent. Waiting is a plain queue get, so it supports a
+    timeout and can be woken at once with cancel().
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.listener is not None:
+                return
+            from pynput import mouse
+
+            self.listener = mouse.Listener(on_click=self._on_click)
+            self.listener.daemon = True
+            self.listener.start()
+            logger.info("Global input listener started")
+
+    def stop(self):
+        with self.lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def _on_click(self, x, y, button, pressed):
+        if pressed:
+            self.events.put(
+                ClickEvent(
+                    int(x), int(y), getattr(button, "name", str(button)), time.time()
+                )
+            )
+
+    def clear(self):
+        """Drop clicks (and stale cancellations) queued before now."""
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def wait_for_click(self, timeout=None):
+        """Return the next ClickEvent, or None on timeout or cancel()."""
+        self.start()
+        try:
+            event = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if event is _CANCELLED:
+            return None
+        return event
+
+    async def wait_for_click_async(self, timeout=None):
+        """Awaitable wait_for_click; cancelling the task also wakes the thread."""
+        try:
+            return await asyncio.to_thread(self.wait_for_click, timeout)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        """Wake up a pending wait_for_click immediately."""
+        self.events.put(_CANCELLED)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_input_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = InputListener()
+        return _listener
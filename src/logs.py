@@ -0,0 +1,136 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import re
+
+# Long runs of base64 are screenshots; a log line never needs their contents
+BASE64_RUN = re.compile(r"[A-Za-z0-9+/]{256,}={0,2}")
+
+# Chatty libraries stay at WARNING unless LOG_LEVELS says otherwise
+DEFAULT_LEVELS = {
+    "httpx": "WARNING",
+    "httpcore": "WARNING",
+    "anthropic": "WARNING",
+    "PIL": "WARNING",
+}
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+def redact(text, max_chars=2000):
+    """Replace base64 payloads with their length and cap the message size."""
+    text = BASE64_RUN.sub(lambda m: f"<base64 {len(m.group())} chars>", text)
+    if max_chars and len(text) > max_chars:
+        text = f"{text[:max_chars]}... [{len(text) - max_chars} chars truncated]"
+    return text
+
+
+class RedactingFormatter(logging.Formatter):
+    def __init__(self, fmt=FORMAT, max_chars=2000):
+        super().__init__(fmt)
+        self.max_chars = max_chars
+
+    def formatMessage(self, record):
+        record.message = redact(record.message, self.max_chars)
+        return super().formatMessage(record)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves %-formatting to the listener thread.
+
+    The stock handler renders every message on the calling thread before
+    queueing it. Here only tracebacks are rendered eagerly, since they
+    refer to the caller's stack; msg and args travel as they are and are
+    formatted, redacted and written by the QueueListener. Arguments must
+    therefore not be mutated after they have been logged.
+    """
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def parse_levels(spec):
+    """Parse "module=LEVEL,other=LEVEL" into a dict."""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Route all logging through a queue to a rotating file and the console.
+
+    Settings come from the environment: LOG_FILE, LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT, LOG_LEVEL, LOG_LEVELS, LOG_CONSOLE_LEVEL and
+    LOG_MAX_MESSAGE_CHARS. Calling it again replaces the previous setup.
+    """
+    global _listener
+    stop_logging()
+
+    max_chars = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+    formatter = RedactingFormatter(max_chars=max_chars)
+    handlers = []
+
+    path = os.getenv("LOG_FILE", "agent.log")
+    if path:
+        file_handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024))),
+            backupCount=int(os.getenv("LOG_BACKUP_COUNT", "3")),
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper())
+    console_handler.setFormatter(formatter)
+    handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    levels = {**DEFAULT_LEVELS, **parse_levels(os.getenv("LOG_LEVELS"))}
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread.
+
+    The queue handler is detached first, so records logged afterwards go to
+    logging's last-resort stderr handler instead of a queue nobody drains.
+    """
+    global _listener
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DeferredQueueHandler):
+            root.removeHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,20 +1,16 @@
-import logging
 import sys
 
+from dotenv import load_dotenv
 from PyQt6.QtWidgets import QApplication
 
-from .anthropic import AnthropicClient
+from .logs import configure_logging, stop_logging
 from .store import Store
 from .window import MainWindow
 
-logging.basicConfig(
-    filename="agent.log",
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
-
 
 def main():
+    load_dotenv()  # Settings in .env must be visible before Store reads them
+    configure_logging()
     app = QApplication(sys.argv)
 
     app.setQuitOnLastWindowClosed(
@@ -22,12 +18,16 @@ def main():
     )  # Prevent app from quitting when window is closed
 
     store = Store()
-    anthropic_client = AnthropicClient()
+    if store.anthropic_client:
+        # Pay for the TLS handshake while the user is still reading the window
+        store.anthropic_client.preconnect()
 
-    window = MainWindow(store, anthropic_client)
+    window = MainWindow(store)
     window.show()  # Just show normally, no maximize
 
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    stop_logging()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
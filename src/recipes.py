@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from .fingerprint import Fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_instruction(instruction):
+    """Key for looking up recipes: lowercase words without punctuation."""
+    return " ".join(re.findall(r"\w+", instruction.lower()))
+
+
+class Recipe:
+    """A successful run reduced to what is needed to guide it again.
+
+    Each step holds the AI-space highlight target, the text shown with it
+    and the fingerprint of the screen the model saw before choosing it.
+    `final` is the fingerprint of the screen on which the model declared the
+    task done.
+    """
+
+    def __init__(self, instruction, ai_size, steps=None, final=None):
+        self.instruction = instruction
+        self.ai_size = tuple(ai_size)
+        self.steps = steps or []
+        self.final = final
+
+    def add_step(self, target, text, fingerprint):
+        self.steps.append(
+            {"target": list(target), "text": text, "fingerprint": fingerprint}
+        )
+
+    def to_json(self):
+        return {
+            "instruction": self.instruction,
+            "ai_size": list(self.ai_size),
+            "steps": [
+                {**step, "fingerprint": _dump(step["fingerprint"])}
+                for step in self.steps
+            ],
+            "final": _dump(self.final),
+            "saved": time.time(),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["instruction"],
+            data["ai_size"],
+            [
+                {**step, "fingerprint": _load(step["fingerprint"])}
+                for step in data["steps"]
+            ],
+            _load(data.get("final")),
+        )
+
+
+def _dump(fingerprint):
+    if fingerprint is None:
+        return None
+    return {"digest": fingerprint.digest, "dhash": f"{fingerprint.dhash:x}"}
+
+
+def _load(data):
+    if data is None:
+        return None
+    return Fingerprint(data["digest"], int(data["dhash"], 16))
+
+
+class RecipeBook:
+    """Recipes from successful runs, kept in a JSON file.
+
+    One recipe is stored per normalized instruction and AI resolution; a
+    newer successful run replaces the older recipe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.recipes = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    for data in json.load(f):
+                        recipe = Recipe.from_json(data)
+                        key = self._key(recipe.instruction, recipe.ai_size)
+                        self.recipes[key] = recipe
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Ignoring unreadable recipe file %s: %s", path, e)
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("RECIPE_FILE", "recipes.json")
+        return cls(path) if path else None
+
+    @staticmethod
+    def _key(instruction, ai_size):
+        return (normalize_instruction(instruction), tuple(ai_size))
+
+    def lookup(self, instruction, ai_size):
+        return self.recipes.get(self._key(instruction, ai_size))
+
+    def save(self, recipe):
+        with self.lock:
+            self.recipes[self._key(recipe.instruction, recipe.ai_size)] = recipe
+            partial = f"{self.path}.tmp"
+            with open(partial, "w") as f:
+                json.dump([r.to_json() for r in self.recipes.values()], f)
+            os.replace(partial, self.path)
+        logger.info(
+            "Saved recipe for %r with %d steps", recipe.instruction, len(recipe.steps)
+        )
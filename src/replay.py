@@ -0,0 +1,414 @@
+"""Record and replay agent sessions without the API or a real desktop.
+
+A recorded session is a directory holding `session.jsonl`, the screenshots
+its requests referenced and the full captured frame behind each request,
+all under `screenshots/`. Replay drives Store.run_agent_async headlessly
+with a ReplayClient serving the recorded (or scripted) responses, a
+ScriptedScreen serving the recorded frames and a ScriptedInput that clicks
+the highlighted point.
+
+Usage: python -m src.replay SESSION_DIR [--latency 0.5] [--click-delay 0.2]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from PIL import Image
+
+from anthropic.types.beta import BetaMessage
+
+from .anthropic import CacheStats
+from .input import ClickEvent
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILE = "session.jsonl"
+SCREENSHOT_DIR = "screenshots"
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+def new_session_dir(root):
+    return os.path.join(root, datetime.now().strftime("%Y%m%d-%H%M%S-%f"))
+
+
+def read_session(directory):
+    with open(os.path.join(directory, SESSION_FILE)) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class SessionRecorder:
+    """Wraps an AnthropicClient and writes every turn to a session directory.
+
+    Images are written once to `screenshots/` under a content hash and the
+    recorded requests point at those files, so the log itself stays small.
+    With a `computer_control`, the full frame it last captured is saved
+    before each request as a "frame" record, which is what replay shows;
+    the images in the requests may be thumbnails, crops or stubs.
+    """
+
+    def __init__(self, client, directory, computer_control=None):
+        self.client = client
+        self.directory = directory
+        self.computer_control = computer_control
+        self.turn = 0
+        self.saved = set()
+        self.last_frame = None
+        os.makedirs(os.path.join(directory, SCREENSHOT_DIR), exist_ok=True)
+        self.path = os.path.join(directory, SESSION_FILE)
+
+    @property
+    def cache_stats(self):
+        return self.client.cache_stats
+
+    async def get_next_action(
+        self, run_history, on_text=None, on_coordinate=None, **options
+    ):
+        self.turn += 1
+        await self._record_frame()
+        self._write(
+            {
+                "type": "request",
+                "turn": self.turn,
+                "messages": [self._message(m) for m in run_history],
+            }
+        )
+        start = time.perf_counter()
+        message = await self.client.get_next_action(
+            run_history, on_text=on_text, on_coordinate=on_coordinate, **options
+        )
+        self._write(
+            {
+                "type": "response",
+                "turn": self.turn,
+                "latency": time.perf_counter() - start,
+                "message": message.model_dump(mode="json"),
+            }
+        )
+        return message
+
+    async def _record_frame(self):
+        frame = getattr(self.computer_control, "last_frame", None)
+        if frame is None or frame is self.last_frame:
+            return
+        self.last_frame = frame
+        data = await asyncio.to_thread(_png_bytes, frame)
+        path, _ = self._store_bytes(data, "image/png")
+        self._write({"type": "frame", "turn": self.turn, "path": path})
+
+    def _write(self, record):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _message(self, message):
+        if isinstance(message, BetaMessage):
+            return {
+                "role": message.role,
+                "content": [block.model_dump(mode="json") for block in message.content],
+            }
+        return {**message, "content": self._content(message.get("content"))}
+
+    def _content(self, content):
+        if not isinstance(content, list):
+            return content
+        result = []
+        for block in content:
+            if not isinstance(block, dict):
+                block = block.model_dump(mode="json")
+            if block.get("type") == "image" and block["source"].get("type") == "blob":
+                with open(block["source"]["path"], "rb") as f:
+                    data = f.read()
+                block = {
+                    "type": "image",
+                    "source": {
+                        "type": "file",
+                        "media_type": block["source"]["media_type"],
+                        "path": self._save_bytes(data, block["source"]["media_type"]),
+                    },
+                }
+            elif (
+                block.get("type") == "image" and block["source"].get("type") == "base64"
+            ):
+                block = {
+                    "type": "image",
+                    "source": {
+                        "type": "file",
+                        "media_type": block["source"]["media_type"],
+                        "path": self._save_image(block["source"]),
+                    },
+                }
+            elif block.get("type") == "tool_result":
+                block = {**block, "content": self._content(block.get("content"))}
+            result.append(block)
+        return result
+
+    def _save_image(self, source):
+        return self._save_bytes(base64.b64decode(source["data"]), source["media_type"])
+
+    def _save_bytes(self, data, media_type):
+        path, new = self._store_bytes(data, media_type)
+        if new:
+            self._write({"type": "screenshot", "turn": self.turn, "path": path})
+        return path
+
+    def _store_bytes(self, data, media_type):
+        """Write `data` under its content hash; returns (path, newly written)."""
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        extension = EXTENSIONS.get(media_type, "bin")
+        path = f"{SCREENSHOT_DIR}/{digest}.{extension}"
+        if digest in self.saved:
+            return path, False
+        self.saved.add(digest)
+        with open(os.path.join(self.directory, path), "wb") as f:
+            f.write(data)
+        return path, True
+
+
+def _png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+_ids = itertools.count(1)
+
+
+def scripted_message(content, stop_reason="tool_use"):
+    """Build a BetaMessage-shaped dict for ReplayClient scripts."""
+    return {
+        "id": f"msg_replay_{next(_ids)}",
+        "type": "message",
+        "role": "assistant",
+        "model": "replay",
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": 0},
+    }
+
+
+def move_to(x, y, text=None):
+    content = [{"type": "text", "text": text}] if text else []
+    content.append(
+        {
+            "type": "tool_use",
+            "id": f"toolu_replay_{next(_ids)}",
+            "name": "computer",
+            "input": {"action": "mouse_move", "coordinate": [x, y]},
+        }
+    )
+    return scripted_message(content)
+
+
+def finish(success=True):
+    return scripted_message(
+        [
+            {
+                "type": "tool_use",
+                "id": f"toolu_replay_{next(_ids)}",
+                "name": "finish_run",
+                "input": {"success": success},
+            }
+        ]
+    )
+
+
+class ReplayClient:
+    """Stand-in for AnthropicClient that serves canned responses.
+
+    `responses` are BetaMessage-shaped dicts, optionally with a "latency" in
+    seconds. A fixed `latency` overrides the recorded ones. Every request is
+    kept in `requests` for assertions and byte counting.
+    """
+
+    def __init__(self, responses, latency=None):
+        self.responses = list(responses)
+        self.latency = latency
+        self.cache_stats = CacheStats()
+        self.requests = []
+
+    @classmethod
+    def from_session(cls, directory, latency=None):
+        responses = [
+            {**record["message"], "latency": record["latency"]}
+            for record in read_session(directory)
+            if record["type"] == "response"
+        ]
+        return cls(responses, latency=latency)
+
+    async def get_next_action(
+        self, run_history, on_text=None, on_coordinate=None, **options
+    ):
+        if not self.responses:
+            raise Exception("Replay script exhausted")
+        self.requests.append(list(run_history))
+        data = dict(self.responses.pop(0))
+        recorded_latency = data.pop("latency", 0.0)
+        await asyncio.sleep(
+            self.latency if self.latency is not None else recorded_latency
+        )
+
+        message = BetaMessage.model_validate(data)
+        for block in message.content:
+            if block.type == "text" and on_text:
+                on_text(block.text)
+            elif (
+                block.type == "tool_use" and block.name == "computer" and on_coordinate
+            ):
+                coordinate = block.input.get("coordinate")
+                if block.input.get("action") == "mouse_move" and coordinate:
+                    on_coordinate(coordinate[0], coordinate[1])
+        return message
+
+
+class ScriptedScreen:
+    """Capture backend that shows one frame at a time until advanced."""
+
+    name = "scripted"
+
+    def __init__(self, frames):
+        if not frames:
+            raise ValueError("ScriptedScreen needs at least one frame")
+        self.frames = list(frames)
+        self.index = 0
+        self.grabs = 0
+
+    @classmethod
+    def from_session(cls, directory):
+        """The full frames recorded before each request, in order."""
+        paths = [
+            record["path"]
+            for record in read_session(directory)
+            if record["type"] == "frame"
+        ]
+        return cls([os.path.join(directory, path) for path in paths])
+
+    def grab(self):
+        self.grabs += 1
+        frame = self.frames[self.index]
+        if isinstance(frame, str):
+            frame = Image.open(frame).convert("RGB")
+        return frame
+
+    def advance(self):
+        self.index = min(self.index + 1, len(self.frames) - 1)
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ScriptedInput:
+    """Input listener stand-in that clicks after `delay` seconds.
+
+    Clicks land on `target()` (for example the Store's highlighted point) and
+    `on_click` is called with each ClickEvent, e.g. to advance the screen.
+    """
+
+    def __init__(self, delay=0.0, target=None, on_click=None):
+        self.delay = delay
+        self.target = target
+        self.on_click = on_click
+        self.cancelled = False
+        self.clicks = []
+
+    def clear(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _click(self):
+        if self.cancelled:
+            return None
+        x, y = (self.target() if self.target else None) or (0, 0)
+        event = ClickEvent(int(x), int(y), "left", time.time())
+        self.clicks.append(event)
+        if self.on_click:
+            self.on_click(event)
+        return event
+
+    def wait_for_click(self, timeout=None):
+        time.sleep(self.delay)
+        return self._click()
+
+    async def wait_for_click_async(self, timeout=None):
+        await asyncio.sleep(self.delay)
+        return self._click()
+
+
+async def replay_session(directory, latency=None, click_delay=0.0):
+    """Run the agent loop against a recorded session; return timing stats."""
+    from .computer import ComputerControl
+    from .store import Store
+
+    client = ReplayClient.from_session(directory, latency=latency)
+    screen = ScriptedScreen.from_session(directory)
+    computer = ComputerControl(capture=screen, screen_size=screen.grab().size)
+    store = Store(
+        anthropic_client=client,
+        computer_control=computer,
+        sessions=None,
+        recipes=None,
+        record_dir=None,
+    )
+    store.input_listener = ScriptedInput(
+        delay=click_delay,
+        target=lambda: store.last_target,
+        on_click=lambda event: screen.advance(),
+    )
+    store.set_instructions(_recorded_instructions(directory))
+
+    messages = []
+    start = time.perf_counter()
+    await store.run_agent_async(messages.append, lambda x, y: None)
+    return {
+        "wall_time": time.perf_counter() - start,
+        "turns": len(client.requests),
+        "clicks": len(store.input_listener.clicks),
+        "grabs": screen.grabs,
+        "error": store.error,
+        "messages": messages,
+    }
+
+
+def _recorded_instructions(directory):
+    for record in read_session(directory):
+        if record["type"] == "request":
+            content = record["messages"][0]["content"]
+            if isinstance(content, str):
+                return content
+            return content[0]["text"]
+    raise ValueError(f"No requests recorded in {directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded agent session")
+    parser.add_argument("session", help="Session directory")
+    parser.add_argument(
+        "--latency", type=float, default=None, help="Fixed model latency in seconds"
+    )
+    parser.add_argument("--click-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stats = asyncio.run(replay_session(args.session, args.latency, args.click_delay))
+    for message in stats["messages"]:
+        print(message)
+    print(
+        f"turns={stats['turns']} clicks={stats['clicks']} grabs={stats['grabs']} "
+        f"wall_time={stats['wall_time']:.3f}s error={stats['error']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Headless HTTP server running many guided sessions on one event loop.
+
+Each session is a headless Store whose screen and clicks come from the
+client instead of the local desktop, so the agent loop, history policy,
+token budget, verifier and recipes all behave as in the desktop app. The
+client uploads frames and reports clicks; highlights and messages come
+back as events.
+
+    POST   /sessions?instructions=...     body: image  -> {"session_id": ...}
+    POST   /sessions/{id}/frame           body: image
+    POST   /sessions/{id}/click?x=&y=     body: image after the click
+    GET    /sessions/{id}/events?since=N  long-polls for events after N
+    DELETE /sessions/{id}
+
+Capturing, resizing and encoding run on a bounded thread pool
+(SERVER_ENCODE_WORKERS) shared by all sessions; other blocking calls stay on
+the loop's default executor. Finished sessions are dropped
+SERVER_FINISHED_TTL seconds after they end. aiohttp is only needed for this
+module and comes with the "server" extra: poetry install -E server.
+
+Usage: python -m src.server [--host 127.0.0.1] [--port 8080]
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from PIL import Image
+
+from .anthropic import CacheStats, get_shared_client
+from .computer import ComputerControl
+from .input import ClickEvent
+from .logs import configure_logging, stop_logging
+from .recipes import RecipeBook
+from .sessions import SessionStore
+from .store import Store
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteScreen:
+    """Capture backend serving the latest frame uploaded by the client."""
+
+    name = "remote"
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def grab(self):
+        return self.frame
+
+    def update(self, frame):
+        self.frame = frame
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class RemoteInput:
+    """Input listener fed by click requests instead of a global hook."""
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+
+    def click(self, x, y, button="left"):
+        self.events.put_nowait(ClickEvent(int(x), int(y), button, time.time()))
+
+    def clear(self):
+        while not self.events.empty():
+            self.events.get_nowait()
+
+    def cancel(self):
+        self.events.put_nowait(None)
+
+    async def wait_for_click_async(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.events.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SessionClient:
+    """The shared API client with cache statistics of one session's own.
+
+    Store resets and reports cache_stats per run, which on the shared client
+    would mix every session's numbers together, so usage is recorded here
+    instead.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.cache_stats = CacheStats()
+
+    async def get_next_action(self, run_history, **options):
+        return await self.client.get_next_action(
+            run_history, cache_stats=self.cache_stats, **options
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class RemoteSession:
+    """One client's run: a headless Store plus the events it produced."""
+
+    def __init__(
+        self, session_id, instructions, frame, client, sessions, recipes, pool
+    ):
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.screen = RemoteScreen(frame)
+        self.input = RemoteInput()
+        computer = ComputerControl(capture=self.screen, screen_size=frame.size)
+        self.store = Store(
+            anthropic_client=SessionClient(client),
+            computer_control=computer,
+            input_listener=self.input,
+            advance_on="click",
+            stream=False,
+            sessions=sessions,
+            recipes=recipes,
+            record_dir=None,
+            encode_executor=pool,
+        )
+        self.store.set_instructions(instructions)
+        self.events = []
+        self.changed = asyncio.Condition()
+        self.last_seen = time.monotonic()
+        self.finished_at = None
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            await self.store.run_agent_async(
+                lambda message: self._emit({"type": "message", "text": message}),
+                lambda x, y: self._emit({"type": "highlight", "x": x, "y": y}),
+                lambda: self._emit({"type": "clear"}),
+            )
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.finished_at = time.monotonic()
+            self._emit({"type": "finished", "error": self.store.error})
+
+    def _emit(self, event):
+        # Callbacks also fire on encode threads; events are only touched here
+        self.loop.call_soon_threadsafe(self._append, event)
+
+    def _append(self, event):
+        event["seq"] = len(self.events)
+        self.events.append(event)
+        asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def events_since(self, since, timeout):
+        self.last_seen = time.monotonic()
+        async with self.changed:
+            if len(self.events) <= since:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return self.events[since:]
+
+    @property
+    def finished(self):
+        return self.task is not None and self.task.done()
+
+    def stop(self):
+        self.store.running = False
+        self.input.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+
+class SessionServer:
+    """Holds the sessions and the shared client, pool and stores."""
+
+    def __init__(
+        self, max_sessions=16, encode_workers=4, idle_timeout=600, finished_ttl=60
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.finished_ttl = finished_ttl
+        self.pool = ThreadPoolExecutor(
+            max_workers=encode_workers, thread_name_prefix="encode"
+        )
+        self.client = get_shared_client()
+        self.sessions = SessionStore.from_env()
+        self.recipes = RecipeBook.from_env()
+        self.active = {}
+
+    async def startup(self, app=None):
+        self.reaper = asyncio.create_task(self._reap_idle())
+
+    async def shutdown(self, app=None):
+        self.reaper.cancel()
+        for session in list(self.active.values()):
+            session.stop()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(30, self.finished_ttl))
+            now = time.monotonic()
+            for session_id, session in list(self.active.items()):
+                # Polling keeps last_seen fresh, so finished sessions expire
+                # on their own clock
+                if session.finished_at is not None:
+                    expired = now - session.finished_at > self.finished_ttl
+                else:
+                    expired = now - session.last_seen > self.idle_timeout
+                if expired:
+                    logger.info("Dropping session %s", session_id)
+                    session.stop()
+                    del self.active[session_id]
+
+    async def decode(self, data):
+        def load():
+            with Image.open(io.BytesIO(data)) as image:
+                return image.convert("RGB")
+
+        return await asyncio.to_thread(load)
+
+    async def create(self, instructions, data):
+        running = sum(not session.finished for session in self.active.values())
+        if running >= self.max_sessions:
+            raise OverflowError("Too many active sessions")
+        frame = await self.decode(data)
+        session_id = uuid.uuid4().hex
+        session = RemoteSession(
+            session_id,
+            instructions,
+            frame,
+            self.client,
+            self.sessions,
+            self.recipes,
+            self.pool,
+        )
+        self.active[session_id] = session
+        session.start()
+        logger.info("Started session %s (%dx%d)", session_id, *frame.size)
+        return session
+
+    def get(self, session_id):
+        session = self.active.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        session.last_seen = time.monotonic()
+        return session
+
+    def delete(self, session_id):
+        self.get(session_id).stop()
+        del self.active[session_id]
+
+
+def create_app(server):
+    from aiohttp import web
+
+    async def read_frame(request, required):
+        data = await request.read()
+        if not data:
+            if required:
+                raise web.HTTPBadRequest(text="Request body must be an image")
+            return None
+        try:
+            return await server.decode(data)
+        except Exception as e:
+            raise web.HTTPBadRequest(text=f"Unreadable image: {e}")
+
+    def session_for(request):
+        try:
+            return server.get(request.match_info["session_id"])
+        except KeyError:
+            raise web.HTTPNotFound(text="Unknown session")
+
+    async def create_session(request):
+        instructions = request.query.get("instructions", "").strip()
+        if not instructions:
+            raise web.HTTPBadRequest(text="instructions is required")
+        data = await request.read()
+        if not data:
+            raise web.HTTPBadRequest(text="Request body must be an image")
+        try:
+            session = await server.create(instructions, data)
+        except OverflowError as e:
+            raise web.HTTPTooManyRequests(text=str(e))
+        except Exception as e:
+            raise web.HTTPBadRequest(text=str(e))
+        return web.json_response({"session_id": session.session_id}, status=201)
+
+    async def upload_frame(request):
+        session = session_for(request)
+        session.screen.update(await read_frame(request, required=True))
+        return web.Response(status=204)
+
+    async def click(request):
+        session = session_for(request)
+        try:
+            x, y = int(request.query["x"]), int(request.query["y"])
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest(text="x and y are required integers")
+        # The step verifier compares this frame with the one before the
+        # highlight, so a click without the new screen would always look
+        # like it did nothing
+        session.screen.update(await read_frame(request, required=True))
+        session.input.click(x, y, request.query.get("button", "left"))
+        return web.Response(status=204)
+
+    async def events(request):
+        session = session_for(request)
+        since = int(request.query.get("since", "0"))
+        timeout = min(float(request.query.get("timeout", "25")), 60.0)
+        new_events = await session.events_since(since, timeout)
+        return web.json_response({"events": new_events, "finished": session.finished})
+
+    async def delete_session(request):
+        try:
+            server.delete(request.match_info["session_id"])
+        except KeyError:
+            raise web.HTTPNotFound(text="Unknown session")
+        return web.Response(status=204)
+
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app.router.add_post("/sessions", create_session)
+    app.router.add_post("/sessions/{session_id}/frame", upload_frame)
+    app.router.add_post("/sessions/{session_id}/click", click)
+    app.router.add_get("/sessions/{session_id}/events", events)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.on_startup.append(server.startup)
+    app.on_cleanup.append(server.shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless guided-session server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    load_dotenv()
+    configure_logging()
+    try:
+        from aiohttp import web
+    except ImportError:
+        raise SystemExit("The server needs aiohttp: poetry install -E server")
+
+    server = SessionServer(
+        max_sessions=int(os.getenv("SERVER_MAX_SESSIONS", "16")),
+        encode_workers=int(os.getenv("SERVER_ENCODE_WORKERS", "4")),
+        idle_timeout=float(os.getenv("SERVER_IDLE_TIMEOUT", "600")),
+        finished_ttl=float(os.getenv("SERVER_FINISHED_TTL", "60")),
+    )
+    try:
+        web.run_app(create_app(server), host=args.host, port=args.port)
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import base64
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from anthropic.types.beta import BetaMessage
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FILE = "sessions.db"
+BLOB_DIR = "blobs"
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    instructions TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+
+class SessionStore:
+    """Agent runs on disk: messages in SQLite, screenshots as blob files.
+
+    Screenshots are written once as raw encoded bytes under `blobs/`, named
+    by their SHA-256, and the run history only holds a small "blob" image
+    block pointing at the file. resolve_blobs turns those back into base64
+    blocks, reading the file through mmap, when a request is built. Every
+    message is committed as it is added, so a run that was interrupted by a
+    crash or restart can be loaded again and resumed. prune() removes old
+    sessions and the blobs no remaining session refers to.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, BLOB_DIR)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            os.path.join(directory, DATABASE_FILE), check_same_thread=False
+        )
+        # WAL without a sync per commit: a crash may lose the last message
+        # but never corrupts the database
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        directory = os.getenv("SESSION_STORE_DIR", "sessions")
+        if not directory:
+            return None
+        store = cls(directory)
+        retention_days = float(os.getenv("SESSION_RETENTION_DAYS", "14"))
+        if retention_days > 0:
+            store.prune(retention_days * 24 * 3600)
+        return store
+
+    def put_image(self, data, media_type, size):
+        """Store encoded image bytes and return an image block referencing them."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(
+            self.blob_dir,
+            digest[:2],
+            f"{digest}.{EXTENSIONS.get(media_type, 'bin')}",
+        )
+        if os.path.exists(path):
+            # Refresh the age prune() goes by; the blob is in use again
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write under a temporary name so a crash never leaves a torn blob
+            partial = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(partial, "wb") as f:
+                f.write(data)
+            os.replace(partial, path)
+        width, height = size
+        return {
+            "type": "image",
+            "source": {
+                "type": "blob",
+                "media_type": media_type,
+                "path": os.path.abspath(path),
+                "bytes": len(data),
+                "width": width,
+                "height": height,
+            },
+        }
+
+    def start(self, instructions):
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO sessions VALUES (?, ?, 'running', ?, ?)",
+                (session_id, instructions, now, now),
+            )
+        return session_id
+
+    def append(self, session_id, message):
+        if isinstance(message, BetaMessage):
+            role = message.role
+            content = [
+                block.model_dump(mode="json", exclude_none=True)
+                for block in message.content
+            ]
+        else:
+            role, content = message["role"], message["content"]
+        with self.lock, self.db:
+            (seq,) = self.db.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self.db.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?)",
+                (session_id, seq, role, json.dumps(content)),
+            )
+            self.db.execute(
+                "UPDATE sessions SET updated = ? WHERE id = ?",
+                (time.time(), session_id),
+            )
+
+    def finish(self, session_id, status):
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE sessions SET status = ?, updated = ? WHERE id = ?",
+                (status, time.time(), session_id),
+            )
+
+    def latest_unfinished(self):
+        """The most recent session that neither finished nor failed, or None.
+
+        Sessions that stopped while following a saved recipe have no messages
+        and nothing to resume, so they are skipped.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id, instructions FROM sessions "
+                "WHERE status IN ('running', 'stopped') "
+                "AND EXISTS (SELECT 1 FROM messages WHERE session_id = sessions.id) "
+                "ORDER BY updated DESC LIMIT 1"
+            ).fetchone()
+        return row
+
+    def load(self, session_id):
+        """Return (instructions, messages) for a stored session."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT instructions FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown session: {session_id}")
+            messages = [
+                {"role": role, "content": json.loads(content)}
+                for role, content in self.db.execute(
+                    "SELECT role, content FROM messages "
+                    "WHERE session_id = ? ORDER BY seq",
+                    (session_id,),
+                )
+            ]
+        return row[0], messages
+
+    def prune(self, max_age):
+        """Delete sessions idle for `max_age` seconds and blobs nobody uses.
+
+        Blobs are shared between sessions, so a blob is only deleted when no
+        remaining message refers to it and it was not written or reused
+        within `max_age` either, which keeps the blobs of a run that is
+        still being recorded. Returns (sessions, blobs) deleted.
+        """
+        cutoff = time.time() - max_age
+        with self.lock, self.db:
+            expired = [
+                (session_id,)
+                for (session_id,) in self.db.execute(
+                    "SELECT id FROM sessions WHERE updated < ?", (cutoff,)
+                )
+            ]
+            self.db.executemany("DELETE FROM messages WHERE session_id = ?", expired)
+            self.db.executemany("DELETE FROM sessions WHERE id = ?", expired)
+            referenced = set()
+            for (content,) in self.db.execute("SELECT content FROM messages"):
+                referenced.update(_blob_names(json.loads(content)))
+
+        removed = 0
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name in referenced:
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning("Could not remove blob %s: %s", path, e)
+        if expired or removed:
+            logger.info(
+                "Pruned %d sessions and %d blobs older than %.0f days",
+                len(expired),
+                removed,
+                max_age / (24 * 3600),
+            )
+        return len(expired), removed
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def _blob_names(content):
+    """File names of the blobs referred to by a message's content."""
+    if not isinstance(content, list):
+        return
+    for block in content:
+        if not isinstance(block, dict):
+            continue
+        if block.get("type") == "image" and block["source"].get("type") == "blob":
+            yield os.path.basename(block["source"]["path"])
+        elif block.get("type") == "tool_result":
+            yield from _blob_names(block.get("content"))
+
+
+def read_blob_base64(path):
+    """Base64 of a blob file, mapped rather than read into a bytes object."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return base64.b64encode(mapped).decode("ascii")
+
+
+def resolve_blobs(content):
+    """Copy of `content` with blob image blocks replaced by base64 blocks.
+
+    Lists and blocks without blobs are returned as they are, so the common
+    case costs a walk over the history and no copies.
+    """
+    if not isinstance(content, list):
+        return content
+    resolved = content
+    for index, block in enumerate(content):
+        if not isinstance(block, dict):
+            continue
+        new_block = block
+        if block.get("type") == "image" and block["source"].get("type") == "blob":
+            source = block["source"]
+            new_block = {
+                **block,
+                "source": {
+                    "type": "base64",
+                    "media_type": source["media_type"],
+                    "data": read_blob_base64(source["path"]),
+                },
+            }
+        elif block.get("type") == "tool_result":
+            nested = resolve_blobs(block.get("content"))
+            if nested is not block.get("content"):
+                new_block = {**block, "content": nested}
+        if new_block is not block:
+            if resolved is content:
+                resolved = list(content)
+            resolved[index] = new_block
+    return resolved
@@ -1,86 +1,156 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
 import json
 import logging
-import platform
-from threading import Event
+import math
+import os
+import sqlite3
+import time
 
-
-from PyQt6.QtCore import QObject, QEvent, QEventLoop, pyqtSignal
+from PyQt6.QtCore import QEvent, QEventLoop, QObject, pyqtSignal
 from PyQt6.QtWidgets import QApplication
 
 from anthropic.types.beta import BetaMessage, BetaTextBlock, BetaToolUseBlock
 
-from .anthropic import AnthropicClient
+from .anthropic import get_shared_client
+from .budget import TokenBudget
 from .computer import ComputerControl
+from .fingerprint import same_frame
+from .history import HistoryPolicy, payload_size
+from .input import get_input_listener
+from .recipes import Recipe, RecipeBook
+from .replay import SessionRecorder, new_session_dir
+from .runtime import get_runtime
+from .sessions import SessionStore
+from .tracing import Tracer, span
+from .verifier import CHANGED, UNCERTAIN, UNCHANGED, StepVerifier
+from .watcher import ScreenChangeWatcher
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Sent ahead of the screenshot when the local verifier is confident
+VERDICT_NOTES = {
+    CHANGED: (
+        "Local check: the screen changed substantially around the highlighted "
+        "target, so the step most likely worked. Continue with the next step "
+        "unless the screenshot shows otherwise; take a screenshot if you need "
+        "the whole screen at full scale."
+    ),
+    UNCHANGED: (
+        "Local check: nothing visible changed after the user acted{retried}. "
+        "The step probably needs a different target."
+    ),
+}
 
-class GlobalClickDetector:
-    def __init__(self):
-        self.platform = platform.system().lower()
-        self.click_received = Event()
-
-    def wait_for_click(self):
-        self.click_received.clear()
-
-        if self.platform == 'darwin':
-            from Quartz import NSEvent, NSLeftMouseDown, NSLeftMouseUp
-            from PyObjCTools import AppHelper
-
-            def handle_event(event):
-                self.click_received.set()
-                return True
-
-            mask = NSLeftMouseDown | NSLeftMouseUp
-            # This actually monitors global events
-            self.monitor = NSEvent.addGlobalMonitorForEventsMatchingMask_handler_(
-                mask, handle_event
-            )
-
-        elif self.platform == 'linux':
-            from Xlib import display, X
-            disp = display.Display()
-            root = disp.screen().root
-            root.grab_button(1, X.AnyModifier, True,
-                             X.ButtonPressMask, X.GrabModeAsync,
-                             X.GrabModeAsync, X.NONE, X.NONE)
-
-            while not self.click_received.is_set():
-                event = root.display.next_event()
-                if event.type == X.ButtonPress:
-                    self.click_received.set()
-
-            disp.close()
 
-        # Wait for the click
-        self.click_received.wait()
+class ClickHandler(QObject):
+    clicked = pyqtSignal()
 
 
+# Default for options where None means "disabled" rather than "from env"
+FROM_ENV = object()
 
-class ClickHandler(QObject):
-    clicked = pyqtSignal()
 
 class Store:
-    def __init__(self):
+    def __init__(
+        self,
+        history_policy=None,
+        stream=None,
+        advance_on=None,
+        anthropic_client=None,
+        computer_control=None,
+        input_listener=None,
+        sessions=FROM_ENV,
+        recipes=FROM_ENV,
+        record_dir=FROM_ENV,
+        encode_executor=None,
+    ):
         self.instructions = ""
         self.running = False
         self.error = None
         self.run_history = []
         self.last_tool_use_id = None
-        self.computer_control = ComputerControl()
+        self.anthropic_client = None
         self.position_callback = None
+        if stream is None:
+            stream = os.getenv("STREAM_RESPONSES", "1") != "0"
+        self.stream = stream
+        # "click" waits for any global click, "screen_change" waits until the
+        # screen actually changed after the user acted on the highlight
+        self.advance_on = advance_on or os.getenv("ADVANCE_ON", "click")
+        self.last_target = None
+        # Per-stage deadlines in seconds; None waits indefinitely
+        self.stage_timeouts = {
+            "model": float(os.getenv("MODEL_TIMEOUT", "90")),
+            "capture": 15.0,
+            "action": 10.0,
+            "user_wait": None,
+        }
+        self._run_future = None
+        self._prefetch = None  # (monotonic time, future) of the latest prefetch
+        self.prefetch_max_age = 5.0
+        self.history_policy = history_policy or HistoryPolicy(
+            max_screenshots=int(os.getenv("MAX_SCREENSHOTS", "3")),
+            trim_batch=int(os.getenv("SCREENSHOT_TRIM_BATCH", "3")),
+        )
+
+        # Sessions are recorded per run when RECORD_SESSION_DIR is set
+        if record_dir is FROM_ENV:
+            record_dir = os.getenv("RECORD_SESSION_DIR")
+        self.record_dir = record_dir
+
+        if anthropic_client is not None:
+            self.anthropic_client = anthropic_client
+        else:
+            try:
+                self.anthropic_client = get_shared_client()
+            except ValueError as e:
+                self.error = str(e)
+                logger.error("AnthropicClient initialization error: %s", self.error)
+        self.computer_control = computer_control or ComputerControl()
 
-        try:
-            self.anthropic_client = AnthropicClient()
-        except ValueError as e:
-            self.error = str(e)
-            logger.error(f"AnthropicClient initialization error: {self.error}")
-        self.computer_control = ComputerControl()
+        # Messages and screenshots are kept on disk so runs can be resumed
+        if sessions is FROM_ENV:
+            try:
+                sessions = SessionStore.from_env()
+            except (OSError, sqlite3.Error) as e:
+                logger.error("Session store unavailable, keeping runs in memory: %s", e)
+                sessions = None
+        self.sessions = sessions
+        self.computer_control.image_store = self.sessions
+        self.session_id = None
+        self._resume = None  # (session id, messages) to continue on the next run
+
+        # Obvious step outcomes are judged locally; a click that changed
+        # nothing is retried before the model is asked again
+        self.verify_steps = os.getenv("VERIFY_STEPS", "1") != "0"
+        self.verify_retries = int(os.getenv("VERIFY_RETRIES", "1"))
+
+        # Clicks farther than this from the highlight centre are treated as
+        # misses and answered locally; after click_miss_limit misses in a row
+        # the click is accepted and the model is told where it landed
+        self.click_miss_distance = float(os.getenv("CLICK_MISS_DISTANCE", "120"))
+        self.click_miss_limit = int(os.getenv("CLICK_MISS_LIMIT", "2"))
+        # Executor for capture, resize and encode work; None runs it on
+        # asyncio's default executor
+        self.encode_executor = encode_executor
+        self.highlight_geometry = None  # Callable returning (x, y, radius)
+        # Callable returning our window's (left, top, right, bottom) on screen
+        self.window_geometry = None
+        self.last_highlight = None  # (x, y, radius) as drawn for the last step
+        self.last_click = None  # (ClickEvent, distance, radius) of the accepted click
+
+        # Successful runs are saved as recipes and guided locally next time
+        self.recipes = RecipeBook.from_env() if recipes is FROM_ENV else recipes
+        self.recipe_match_distance = int(os.getenv("RECIPE_MATCH_DISTANCE", "12"))
+
+        self.budget = TokenBudget.from_env()
+        self._foveated_default = self.computer_control.foveated
         self.computer_control.set_position_callback(lambda x, y: None)
 
+        self.input_listener = input_listener or get_input_listener()
         self.click_handler = ClickHandler()
         self.ready_to_continue = False
 
@@ -91,120 +161,656 @@ class Store:
         self.position_callback = callback
         self.computer_control.set_position_callback(callback)
 
+    def on_display_changed(self):
+        """Recompute the AI coordinate space after a display change."""
+        self.computer_control.on_display_changed()
+
+    def prefetch_screenshot(self):
+        """Capture the screen in the background so Run can skip the wait."""
+        if self.running:
+            return
+        # Runs start at full scale; a degraded scale from the last run is stale
+        self.computer_control.image_scale = 1.0
+        future = get_runtime().submit(
+            asyncio.to_thread(self.computer_control.prepare_screenshot)
+        )
+        self._prefetch = (time.monotonic(), future)
+
+    async def _initial_screenshot(self):
+        """Image block for the first message, prefetched if still fresh."""
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is not None:
+            taken_at, future = prefetch
+            if time.monotonic() - taken_at <= self.prefetch_max_age:
+                try:
+                    prepared = await asyncio.wrap_future(future)
+                except Exception as e:
+                    logger.warning(
+                        "Prefetched screenshot failed, capturing again: %s", e
+                    )
+                else:
+                    # Only now is the frame part of a run worth storing
+                    return await self._encode(
+                        self.computer_control.prepared_block, *prepared
+                    )
+        return await self._encode(self.computer_control.screenshot_block)
+
+    def resume_session(self, session_id=None):
+        """Continue a stored session on the next run.
+
+        Without `session_id` the most recent unfinished session is used.
+        Returns its instructions, or None if there is nothing to resume.
+        """
+        if self.sessions is None:
+            return None
+        if session_id is None:
+            row = self.sessions.latest_unfinished()
+            if row is None:
+                return None
+            session_id = row[0]
+        instructions, messages = self.sessions.load(session_id)
+        if not messages:
+            return None
+        self.instructions = instructions
+        self._resume = (session_id, messages)
+        logger.info("Resuming session %s (%d messages)", session_id, len(messages))
+        return instructions
+
+    def _append(self, message):
+        """Add a message to the run history and persist it."""
+        self.run_history.append(message)
+        if self.sessions is not None and self.session_id is not None:
+            self.sessions.append(self.session_id, message)
+
     def set_instructions(self, instructions):
         self.instructions = instructions
-        logger.info(f"Instructions set: {instructions}")
+        logger.info("Instructions set: %s", instructions)
+
+    def run_agent(self, update_callback, position_callback, clear_callback=None):
+        """Run the agent loop on the shared event loop and block until it ends.
+
+        Called from AgentThread, so only that QThread blocks; stop_run can be
+        called from the GUI thread at any time.
+        """
+        self._run_future = get_runtime().submit(
+            self.run_agent_async(update_callback, position_callback, clear_callback)
+        )
+        try:
+            self._run_future.result()
+        except concurrent.futures.CancelledError:
+            logger.info("Agent run cancelled")
+        finally:
+            self._run_future = None
+
+    async def _stage(self, name, awaitable):
+        """Await one stage of a turn, enforcing its deadline."""
+        timeout = self.stage_timeouts.get(name)
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise Exception(f"{name} timed out after {timeout}s")
 
-    def run_agent(self, update_callback, position_callback):
+    async def run_agent_async(
+        self, update_callback, position_callback, clear_callback=None
+    ):
         if self.error:
             update_callback(f"Error: {self.error}")
-            logger.error(f"Agent run failed due to initialization error: {self.error}")
+            logger.error("Agent run failed due to initialization error: %s", self.error)
             return
 
-        self.position_callback = position_callback
-        self.computer_control.set_position_callback(position_callback)
+        def on_position(x, y):
+            self.last_target = (x, y)
+            with span("overlay", x=x, y=y):
+                position_callback(x, y)
+
+        self.position_callback = on_position
+        self.clear_callback = clear_callback or (lambda: None)
+        self.computer_control.set_position_callback(on_position)
+        self.last_target = None
+        self.computer_control.last_target = None
+        self.computer_control.image_scale = 1.0
+        self.computer_control.foveated = self._foveated_default
+        self.budget.reset()
         self.running = True
         self.error = None
-        self.run_history = [{"role": "user", "content": self.instructions}]
-        logger.info("Starting agent run")
-
-        is_first_action = True
-
-        click_detector = GlobalClickDetector()
+        client = self.anthropic_client
+        if self.record_dir:
+            client = SessionRecorder(
+                client, new_session_dir(self.record_dir), self.computer_control
+            )
+            logger.info("Recording session to %s", client.directory)
+        client.cache_stats.reset()
+        tracer = Tracer()
+        tracer.activate()
+        logger.info("Starting agent run %s", tracer.run_id)
+
+        # Polls bypass the traced grab so they do not swamp the capture stats
+        change_watcher = ScreenChangeWatcher(self.computer_control.capture.grab)
+        verifier = StepVerifier(change_watcher) if self.verify_steps else None
+
+        resume, self._resume = self._resume, None
+        recipe = None
+        turn = 0
+        finished = False
+        self.session_id = None
 
-        while self.running:
+        try:
             try:
-                message = self.anthropic_client.get_next_action(self.run_history)
-                self.run_history.append(message)
-                logger.debug(f"Received message from Anthropic: {message}")
-
-                action = self.extract_action(message)
-                logger.info(f"Extracted action: {action}")
-
-                if action["type"] in ["finish", "error", "mouse_move", "screenshot"]:
-                    # Display assistant's message in the chat
-                    self.display_assistant_message(message, update_callback)
-
-                    if action["type"] == "error":
-                        self.error = action["message"]
-                        update_callback(f"Error: {self.error}")
-                        logger.error(f"Action extraction error: {self.error}")
-                        self.running = False
-                        break
-                    elif action["type"] == "finish":
+                if resume is not None:
+                    await self._resume_history(*resume)
+                else:
+                    self.session_id = (
+                        self.sessions.start(self.instructions)
+                        if self.sessions
+                        else None
+                    )
+                    recipe = Recipe(self.instructions, self.computer_control.ai_size)
+                    outcome = await self._follow_saved_recipe(
+                        recipe, change_watcher, verifier, update_callback
+                    )
+                    if outcome == "finished":
                         update_callback("Task completed successfully.")
-                        logger.info("Task completed successfully")
+                        logger.info("Task completed from a saved recipe")
+                        finished = True
                         self.running = False
-                        break
-
-                    # Perform the action (shows highlight)
-                    self.computer_control.perform_action(action)
-                    logger.info(f"Performed action: {action['type']}")
-
-                    # Wait for click (except for first action)
-                    if not is_first_action:
-                        update_callback("Please click anywhere to continue...")
-                        click_detector.wait_for_click()
-                        update_callback("Click detected!")
-
-                    is_first_action = False
-
-                # Take screenshot after action
-                screenshot = self.computer_control.take_screenshot()
-                self.run_history.append(
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "tool_result",
-                                "tool_use_id": self.last_tool_use_id,
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "Here is a screenshot after the action was executed",
-                                    },
-                                    {
-                                        "type": "image",
-                                        "source": {
-                                            "type": "base64",
-                                            "media_type": "image/png",
-                                            "data": screenshot,
-                                        },
-                                    },
-                                ],
-                            }
-                        ],
-                    }
-                )
-                logger.debug("Screenshot added to run history")
-
+                        return
+                    if outcome == "stopped":
+                        self.running = False
+                        return
+                    if recipe.steps:
+                        # The prefetched frame predates the steps already guided
+                        self._prefetch = None
+                    # Send the screen with the instructions so the model does
+                    # not spend its first turn asking for a screenshot
+                    screenshot = await self._stage(
+                        "capture", self._initial_screenshot()
+                    )
+                    self.run_history = []
+                    self._append(
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": self.instructions},
+                                *self._completed_steps_note(recipe),
+                                {
+                                    "type": "text",
+                                    "text": "This is my screen right now:",
+                                },
+                                screenshot,
+                            ],
+                        }
+                    )
             except Exception as e:
                 self.error = str(e)
                 update_callback(f"Error: {self.error}")
-                logger.exception(f"Unexpected error during agent run: {self.error}")
+                logger.exception("Starting the run failed: %s", self.error)
                 self.running = False
-                break
+                return
+
+            while self.running:
+                try:
+                    turn += 1
+                    tracer.turn = turn
+                    verdict = None
+                    self.history_policy.apply(self.run_history)
+                    await self.budget.enforce(
+                        self.run_history,
+                        self.history_policy,
+                        self.computer_control,
+                        client,
+                    )
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info(
+                            "Turn %d payload: %d bytes",
+                            turn,
+                            payload_size(self.run_history),
+                        )
+                    if self.stream:
+                        request = client.get_next_action(
+                            self.run_history,
+                            on_text=lambda text: update_callback(f"Assistant: {text}"),
+                            on_coordinate=self.computer_control.preview_position,
+                            display_size=self.computer_control.ai_size,
+                        )
+                    else:
+                        request = client.get_next_action(
+                            self.run_history,
+                            display_size=self.computer_control.ai_size,
+                        )
+                    message = await self._stage("model", request)
+                    self.budget.record(message.usage)
+                    self._append(message)
+                    logger.debug("Received message from Anthropic: %s", message)
+
+                    with span("tool_parse"):
+                        action = self.extract_action(message)
+                    logger.info("Extracted action: %s", action)
+                    if recipe is not None:
+                        self._record_recipe_step(recipe, message, action)
+
+                    if action["type"] in [
+                        "finish",
+                        "error",
+                        "mouse_move",
+                        "screenshot",
+                    ]:
+                        # Display assistant's message in the chat
+                        self.display_assistant_message(
+                            message, update_callback, include_text=not self.stream
+                        )
+
+                        if action["type"] == "error":
+                            self.error = action["message"]
+                            update_callback(f"Error: {self.error}")
+                            logger.error("Action extraction error: %s", self.error)
+                            self.running = False
+                            break
+                        elif action["type"] == "finish":
+                            update_callback("Task completed successfully.")
+                            logger.info("Task completed successfully")
+                            finished = True
+                            if recipe is not None and action["success"]:
+                                self._save_recipe(recipe)
+                            self.running = False
+                            break
+
+                        # Show the highlight and wait for the user to act on
+                        # it; a screenshot request needs nothing from them
+                        if action["type"] == "mouse_move":
+                            verdict = await self._guide_step(
+                                action, change_watcher, verifier, update_callback
+                            )
+                            if verdict is None:
+                                break
+                        else:
+                            await self._stage(
+                                "action",
+                                asyncio.to_thread(
+                                    self.computer_control.perform_action, action
+                                ),
+                            )
+                        logger.info("Performed action: %s", action["type"])
+
+                    # Take screenshot after action. A step the verifier saw
+                    # work gets the cheaper overview plus crop around its target
+                    content = await self._stage(
+                        "capture",
+                        self._encode(
+                            self.computer_control.screenshot_content,
+                            True if verdict == CHANGED else None,
+                        ),
+                    )
+                    for note in (self._verdict_note(verdict), self._click_note()):
+                        if note:
+                            content.insert(0, {"type": "text", "text": note})
+                    self.last_click = None
+                    self._append(
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "tool_result",
+                                    "tool_use_id": self.last_tool_use_id,
+                                    "content": content,
+                                }
+                            ],
+                        }
+                    )
+                    logger.debug("Screenshot added to run history")
+
+                except Exception as e:
+                    self.error = str(e)
+                    update_callback(f"Error: {self.error}")
+                    logger.exception(
+                        "Unexpected error during agent run: %s", self.error
+                    )
+                    self.running = False
+                    break
+        except asyncio.CancelledError:
+            self.running = False
+            update_callback("Agent run stopped.")
+            raise
+        finally:
+            if self.sessions is not None and self.session_id is not None:
+                status = (
+                    "error" if self.error else "finished" if finished else "stopped"
+                )
+                self.sessions.finish(self.session_id, status)
+            logger.info("Per-stage timings:\n%s", tracer.summary())
+            tracer.flush()
+
+    async def _guide_step(self, action, change_watcher, verifier, update_callback):
+        """Highlight a target, wait for the user and judge the outcome locally.
+
+        A step that clearly changed nothing is shown again, up to
+        verify_retries times, without asking the model. Returns the verdict,
+        UNCERTAIN without a verifier, or None if the run stopped.
+        """
+        before = None
+        if verifier is not None:
+            # The frame the model chose this step on. It was grabbed before the
+            # response arrived, so a streamed preview of the highlight is not in
+            # it; a fresh snapshot here could already show the circle
+            frame = self.computer_control.last_frame
+            if frame is not None:
+                before = await self._encode(verifier.reduce, frame)
+            else:
+                before = await self._stage("capture", self._encode(verifier.snapshot))
+
+        verdict = UNCERTAIN
+        for attempt in range(self.verify_retries + 1):
+            await self._stage(
+                "action",
+                asyncio.to_thread(self.computer_control.perform_action, action),
+            )
+            if not await self._wait_for_user(change_watcher, update_callback):
+                return None
+            if verifier is None:
+                return UNCERTAIN
+
+            # The screen-change watcher has already waited for things to settle
+            if self.advance_on != "screen_change":
+                await asyncio.sleep(verifier.settle_time)
+            with span("verify") as active:
+                verdict, region, whole = await self._encode(
+                    verifier.judge,
+                    before,
+                    self.last_target,
+                    self.last_highlight,
+                    self._excluded_regions(),
+                )
+                active.set(verdict=verdict, region=region, whole=whole)
+            if verdict != UNCHANGED or attempt == self.verify_retries:
+                return verdict
+            update_callback(
+                "Nothing changed on the screen. Please try the highlighted spot again."
+            )
+        return verdict
+
+    async def _follow_saved_recipe(
+        self, recipe, change_watcher, verifier, update_callback
+    ):
+        """Guide the user through a saved recipe while the screen matches it.
+
+        Each step is shown locally only if the current screen matches the one
+        the model saw when it chose that step. Steps taken are added to
+        `recipe`. Returns "finished", "stopped", "diverged" or None when there
+        is no saved recipe for these instructions.
+        """
+        saved = (
+            self.recipes.lookup(self.instructions, self.computer_control.ai_size)
+            if self.recipes is not None
+            else None
+        )
+        if saved is None:
+            return None
+        update_callback("Following the saved steps for this task...")
+        try:
+            for number, step in enumerate(saved.steps, 1):
+                current = await self._current_fingerprint()
+                if not same_frame(
+                    current, step["fingerprint"], self.recipe_match_distance
+                ):
+                    logger.info("Screen differs from the recipe at step %d", number)
+                    return "diverged"
+
+                with span("recipe_step", step=number):
+                    x, y = step["target"]
+                    action = {"type": "mouse_move", "x": x, "y": y}
+                    if step["text"]:
+                        update_callback(f"Assistant: {step['text']}")
+                    update_callback(
+                        f"Performed action: {json.dumps({**action, 'text': None})}"
+                    )
+                recipe.add_step(step["target"], step["text"], current)
+                verdict = await self._guide_step(
+                    action, change_watcher, verifier, update_callback
+                )
+                if verdict is None:
+                    return "stopped"
+
+            current = await self._current_fingerprint()
+            if same_frame(current, saved.final, self.recipe_match_distance):
+                recipe.final = current
+                self._save_recipe(recipe)
+                return "finished"
+            return "diverged"
+        except Exception as e:
+            # The model can always take over from wherever the user is now
+            logger.warning("Following the saved recipe failed: %s", e)
+            return "diverged"
+
+    async def _current_fingerprint(self):
+        return await self._stage(
+            "capture", self._encode(self.computer_control.current_fingerprint)
+        )
+
+    def _completed_steps_note(self, recipe):
+        if recipe is None or not recipe.steps:
+            return []
+        steps = "\n".join(
+            f"{number}. {step['text'] or 'Click at ' + str(tuple(step['target']))}"
+            for number, step in enumerate(recipe.steps, 1)
+        )
+        return [
+            {
+                "type": "text",
+                "text": f"I have already followed these steps:\n{steps}",
+            }
+        ]
+
+    def _record_recipe_step(self, recipe, message, action):
+        if action["type"] != "mouse_move":
+            return
+        text = " ".join(
+            item.text.strip()
+            for item in message.content
+            if isinstance(item, BetaTextBlock) and item.text.strip()
+        )
+        recipe.add_step(
+            (action["x"], action["y"]), text, self.computer_control.last_fingerprint
+        )
+
+    def _save_recipe(self, recipe):
+        if self.recipes is None or not recipe.steps:
+            return
+        if recipe.final is None:
+            recipe.final = self.computer_control.last_fingerprint
+        try:
+            self.recipes.save(recipe)
+        except OSError as e:
+            logger.warning("Could not save recipe: %s", e)
+
+    async def _resume_history(self, session_id, messages):
+        """Load a stored session into run_history, ready for the next turn."""
+        self.session_id = session_id
+        self.run_history = list(messages)
+        # The screen the model saw last is not known after a restart
+        self.computer_control.last_fingerprint = None
+        last = messages[-1]
+        if last["role"] != "assistant":
+            return
+        # The run stopped after the model answered; the tool_result for that
+        # answer was never sent, so send the current screen as the result
+        tool_use = next(
+            (
+                block
+                for block in reversed(last["content"])
+                if block.get("type") == "tool_use"
+            ),
+            None,
+        )
+        if tool_use is None:
+            raise Exception("Stored session has no pending step to resume")
+        self.last_tool_use_id = tool_use["id"]
+        content = await self._stage(
+            "capture", self._encode(self.computer_control.screenshot_content)
+        )
+        content.insert(
+            0, {"type": "text", "text": "The session was resumed after a restart."}
+        )
+        self._append(
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": self.last_tool_use_id,
+                        "content": content,
+                    }
+                ],
+            }
+        )
+
+    async def _wait_for_user(self, change_watcher, update_callback):
+        """Wait until the user acted on the highlight; False if the run stopped."""
+        with span("user_wait", mode=self.advance_on):
+            acted = await self._wait_for_user_action(change_watcher, update_callback)
+        # Remember where the circle was drawn so the verifier can mask it
+        self.last_highlight = (
+            self.highlight_geometry() if self.highlight_geometry else None
+        )
+        # The step is over; nothing should stay highlighted while we think
+        self.clear_callback()
+        return acted
+
+    def _encode(self, func, *args):
+        """Run capture, resize or encode work off the event loop.
+
+        Uses encode_executor when one is set, so this work cannot queue up
+        behind unrelated blocking calls; the tracing context goes along as
+        it does with asyncio.to_thread.
+        """
+        if self.encode_executor is None:
+            return asyncio.to_thread(func, *args)
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(
+            self.encode_executor, functools.partial(context.run, func, *args)
+        )
+
+    def _excluded_regions(self):
+        """Screen rectangles that change on their own, i.e. our window."""
+        rect = self.window_geometry() if self.window_geometry else None
+        return [rect] if rect else []
+
+    def _verdict_note(self, verdict):
+        note = VERDICT_NOTES.get(verdict)
+        if note is None:
+            return None
+        retried = ", even after being asked to retry" if self.verify_retries else ""
+        return note.format(retried=retried)
+
+    async def _wait_for_user_action(self, change_watcher, update_callback):
+        if self.advance_on == "screen_change":
+            update_callback(
+                "Follow the highlight; I'll continue when the screen changes..."
+            )
+            changed = await self._stage(
+                "user_wait",
+                asyncio.to_thread(
+                    change_watcher.wait_for_change,
+                    self.last_target,
+                    should_stop=lambda: not self.running,
+                    highlight=(
+                        self.highlight_geometry() if self.highlight_geometry else None
+                    ),
+                    exclude=self._excluded_regions(),
+                ),
+            )
+            if changed:
+                update_callback("Screen change detected!")
+            return changed
+
+        self.input_listener.clear()
+        self.last_click = None
+        if not self.running:
+            return False
+        update_callback("Please click the highlighted spot to continue...")
+        misses = 0
+        while True:
+            click = await self._stage(
+                "user_wait", self.input_listener.wait_for_click_async()
+            )
+            if click is None:
+                return False
+            distance, radius = self._click_distance(click)
+            if (
+                distance is not None
+                and distance > self.click_miss_distance
+                and misses < self.click_miss_limit
+            ):
+                misses += 1
+                logger.info(
+                    "Click at (%d, %d) missed by %.0f px", click.x, click.y, distance
+                )
+                update_callback(
+                    "That click was outside the highlighted area. "
+                    "Please click inside the red circle."
+                )
+                continue
+            self.last_click = (click, distance, radius)
+            update_callback("Click detected!")
+            return True
+
+    def _click_distance(self, click):
+        """(distance, radius) of a click from the highlight, in screen pixels.
+
+        Uses the circle as drawn when the window provides highlight_geometry,
+        else the target point itself; (None, None) without either.
+        """
+        geometry = self.highlight_geometry() if self.highlight_geometry else None
+        if geometry is None:
+            if self.last_target is None:
+                return None, None
+            geometry = (*self.last_target, 0)
+        x, y, radius = geometry
+        return math.hypot(click.x - x, click.y - y), radius
+
+    def _click_note(self):
+        """Text telling the model where the user's last click landed."""
+        if self.last_click is None:
+            return None
+        click, distance, radius = self.last_click
+        ai_x, ai_y = self.computer_control.map_to_ai_space(click.x, click.y)
+        text = f"The user clicked at ({round(ai_x)}, {round(ai_y)})"
+        if distance is not None:
+            if distance <= radius:
+                text += ", inside the highlighted area"
+            else:
+                # Report the miss in the model's own pixels
+                computer = self.computer_control
+                scale = computer.ai_size[0] / computer.screen_width
+                text += f", about {distance * scale:.0f} px from the highlighted target"
+        return text + "."
 
     def stop_run(self):
+        """Stop the current run right away, including any in-flight request."""
         self.running = False
+        self.input_listener.cancel()
+        future = self._run_future
+        if future is not None:
+            future.cancel()
         logger.info("Agent run stopped")
 
     def extract_action(self, message):
-        logger.debug(f"Extracting action from message: {message}")
+        logger.debug("Extracting action from message: %s", message)
         if not isinstance(message, BetaMessage):
-            logger.error(f"Unexpected message type: {type(message)}")
+            logger.error("Unexpected message type: %s", type(message))
             return {"type": "error", "message": "Unexpected message type"}
 
         for item in message.content:
             if isinstance(item, BetaToolUseBlock):
                 tool_use = item
-                logger.debug(f"Found tool use: {tool_use}")
+                logger.debug("Found tool use: %s", tool_use)
                 self.last_tool_use_id = tool_use.id
                 if tool_use.name == "finish_run":
-                    return {"type": "finish"}
+                    return {
+                        "type": "finish",
+                        "success": bool(tool_use.input.get("success", True)),
+                    }
 
                 if tool_use.name != "computer":
-                    logger.error(f"Unexpected tool: {tool_use.name}")
+                    logger.error("Unexpected tool: %s", tool_use.name)
                     return {
                         "type": "error",
                         "message": f"Unexpected tool: {tool_use.name}",
@@ -219,7 +825,7 @@ class Store:
                         or len(input_data["coordinate"]) != 2
                     ):
                         logger.error(
-                            f"Invalid coordinate for mouse action: {input_data}"
+                            "Invalid coordinate for mouse action: %s", input_data
                         )
                         return {
                             "type": "error",
@@ -241,14 +847,14 @@ class Store:
                     return {"type": action_type}
                 elif action_type in ["type", "key"]:
                     if "text" not in input_data:
-                        logger.error(f"Missing text for keyboard action: {input_data}")
+                        logger.error("Missing text for keyboard action: %s", input_data)
                         return {
                             "type": "error",
                             "message": "Missing text for keyboard action",
                         }
                     return {"type": action_type, "text": input_data["text"]}
                 else:
-                    logger.error(f"Unsupported action: {action_type}")
+                    logger.error("Unsupported action: %s", action_type)
                     return {
                         "type": "error",
                         "message": f"Unsupported action: {action_type}",
@@ -257,10 +863,13 @@ class Store:
         logger.error("No tool use found in message")
         return {"type": "error", "message": "No tool use found in message"}
 
-    def display_assistant_message(self, message, update_callback):
+    def display_assistant_message(self, message, update_callback, include_text=True):
+        # Streamed runs have already shown the text as it arrived
         if isinstance(message, BetaMessage):
             for item in message.content:
                 if isinstance(item, BetaTextBlock):
+                    if not include_text:
+                        continue
                     # Clean and format the text
                     text = item.text.strip()
                     if text:  # Only send non-empty messages
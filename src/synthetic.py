@@ -0,0 +1,175 @@
+import random
+
+from PIL import Image, ImageDraw
+
+
+def desktop_frame(width=3840, height=2160, seed=0, windows=3):
+    """Render a desktop-like test frame.
+
+    The result has what makes real screenshots compress the way they do: a
+    smooth wallpaper gradient, flat window chrome, a taskbar, icons and lots
+    of small text.
+    """
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height))
+    draw = ImageDraw.Draw(image)
+
+    top = (rng.randrange(20, 80), rng.randrange(60, 120), rng.randrange(120, 200))
+    bottom = (rng.randrange(120, 200), rng.randrange(40, 100), rng.randrange(60, 140))
+    for y in range(height):
+        t = y / max(height - 1, 1)
+        color = tuple(int(a + (b - a) * t) for a, b in zip(top, bottom))
+        draw.line([(0, y), (width, y)], fill=color)
+
+    icon = max(height // 20, 24)
+    for row in range(6):
+        x0, y0 = icon // 2, icon // 2 + row * icon * 2
+        draw.rounded_rectangle(
+            [x0, y0, x0 + icon, y0 + icon],
+            radius=icon // 6,
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+        draw.text((x0, y0 + icon + 4), f"Item {row}", fill="white")
+
+    for _ in range(windows):
+        w = rng.randrange(width // 4, width // 2)
+        h = rng.randrange(height // 4, height // 2)
+        x = rng.randrange(icon * 2, max(width - w, icon * 2 + 1))
+        y = rng.randrange(0, max(height - h - icon, 1))
+        draw_window(draw, (x, y, x + w, y + h), rng)
+
+    bar = max(height // 30, 20)
+    draw.rectangle([0, height - bar, width, height], fill=(32, 32, 36))
+    for i in range(8):
+        x0 = bar + i * bar * 2
+        draw.rectangle(
+            [x0, height - bar + 4, x0 + bar - 8, height - 4],
+            fill=tuple(rng.randrange(80, 256) for _ in range(3)),
+        )
+    draw.text((width - bar * 4, height - bar + 6), "12:34", fill="white")
+    return image
+
+
+def draw_window(draw, box, rng, title="Window"):
+    x0, y0, x1, y1 = box
+    draw.rectangle(box, fill=(245, 245, 245), outline=(120, 120, 120))
+    draw.rectangle([x0, y0, x1, y0 + 28], fill=(225, 225, 230))
+    draw.text((x0 + 10, y0 + 8), title, fill="black")
+    for i, color in enumerate(("#ff5f57", "#febc2e", "#28c840")):
+        cx = x1 - 20 - i * 22
+        draw.ellipse([cx - 6, y0 + 8, cx + 6, y0 + 20], fill=color)
+
+    y = y0 + 40
+    while y < y1 - 16:
+        words = rng.randrange(3, 12)
+        line = " ".join(
+            "".join(
+                rng.choice("abcdefghijklmnopqrstuvwxyz")
+                for _ in range(rng.randrange(2, 9))
+            )
+            for _ in range(words)
+        )
+        draw.text((x0 + 16, y), line, fill=(40, 40, 40))
+        y += 18
+
+
+# Tasks for the closed-loop benchmark: instruction and the buttons to click
+TASKS = {
+    "dark-mode": ("Turn on dark mode", ["Settings", "Appearance", "Dark"]),
+    "brightness": (
+        "Make my screen brighter",
+        ["Settings", "Displays", "Brightness +"],
+    ),
+    "wifi": ("Connect to the office Wi-Fi", ["Network", "Wi-Fi", "Office", "Connect"]),
+}
+
+
+class SyntheticDesktop:
+    """Capture backend showing a sequence of rendered screens.
+
+    Screen i shows a button labelled `labels[i]`; a click inside it moves to
+    screen i + 1. The screen after the last button has no target and means
+    the task is done. Frames are rendered once and reused.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, labels, width=1920, height=1080, seed=0):
+        self.labels = list(labels)
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.index = 0
+        self.grabs = 0
+        self.clicks = []
+        self._base = None
+        self._frames = {}
+
+        rng = random.Random(seed)
+        button_w, button_h = max(width // 12, 80), max(height // 24, 28)
+        self.boxes = []
+        for _ in self.labels:
+            x = rng.randrange(width // 8, width - width // 8 - button_w)
+            y = rng.randrange(height // 8, height - height // 6 - button_h)
+            self.boxes.append((x, y, x + button_w, y + button_h))
+
+    @property
+    def done(self):
+        return self.index >= len(self.labels)
+
+    @property
+    def target(self):
+        """Centre of the current button in screen pixels, or None when done."""
+        if self.done:
+            return None
+        return self.target_at(self.index)
+
+    def target_at(self, index):
+        x0, y0, x1, y1 = self.boxes[index]
+        return ((x0 + x1) // 2, (y0 + y1) // 2)
+
+    def click(self, x, y):
+        """Apply a click; returns True if it hit the current button."""
+        self.clicks.append((x, y))
+        if self.done:
+            return False
+        x0, y0, x1, y1 = self.boxes[self.index]
+        if x0 <= x <= x1 and y0 <= y <= y1:
+            self.index += 1
+            return True
+        return False
+
+    def grab(self):
+        self.grabs += 1
+        if self.index not in self._frames:
+            self._frames[self.index] = self._render(self.index)
+        return self._frames[self.index]
+
+    def _render(self, index):
+        if self._base is None:
+            self._base = desktop_frame(self.width, self.height, self.seed, windows=2)
+        image = self._base.copy()
+        draw = ImageDraw.Draw(image)
+        rng = random.Random(self.seed * 1000 + index)
+        if index > 0:
+            margin_x, margin_y = self.width // 10, self.height // 10
+            title = " > ".join(self.labels[:index])
+            draw_window(
+                draw,
+                (margin_x, margin_y, self.width - margin_x, self.height - margin_y),
+                rng,
+                title,
+            )
+        if index < len(self.labels):
+            box = self.boxes[index]
+            draw.rounded_rectangle(box, radius=6, fill=(0, 102, 204), outline="white")
+            draw.text((box[0] + 10, box[1] + 8), self.labels[index], fill="white")
+        else:
+            draw.text((self.width // 2 - 40, self.height // 2), "Done", fill="black")
+        return image
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
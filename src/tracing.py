@@ -0,0 +1,132 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar("tracer", default=None)
+
+
+class Span:
+    def __init__(self, name, turn, attrs):
+        self.name = name
+        self.turn = turn
+        self.attrs = dict(attrs)
+        self.start = time.time()
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, run_id):
+        return {
+            "run": run_id,
+            "turn": self.turn,
+            "span": self.name,
+            "start": self.start,
+            "ms": round(self.duration * 1000, 3),
+            **self.attrs,
+        }
+
+
+class Tracer:
+    """Collects per-stage timing spans for one agent run.
+
+    Spans are kept in memory for the summary table logged at the end of the
+    run, and `flush` appends the ones not yet written to a JSONL file
+    (TRACE_FILE, off by default) in a single write, so finishing a span never
+    touches the disk. The tracer is found through a context
+    variable, so code running under asyncio.to_thread reports into the run
+    that started it without the tracer being passed around.
+    """
+
+    def __init__(self, path=None):
+        self.path = os.getenv("TRACE_FILE", "") if path is None else path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.turn = 0
+        self.spans = []
+        self.written = 0  # spans already flushed to the file
+        self.lock = threading.Lock()
+
+    def activate(self):
+        """Make this the tracer for the current context (and its children)."""
+        return _current.set(self)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = Span(name, self.turn, attrs)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - start
+            self._finish(span)
+
+    def _finish(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def flush(self):
+        """Append the spans finished since the last flush to the trace file."""
+        with self.lock:
+            pending = self.spans[self.written :]
+            self.written = len(self.spans)
+        if not self.path or not pending:
+            return
+        lines = "".join(
+            json.dumps(span.to_dict(self.run_id)) + "\n" for span in pending
+        )
+        try:
+            with open(self.path, "a") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning("Could not write trace file %s: %s", self.path, e)
+
+    def summary(self):
+        """A per-stage table of count, total, mean and max time plus sizes."""
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(
+                span.name, {"count": 0, "total": 0.0, "max": 0.0, "bytes": 0}
+            )
+            stage["count"] += 1
+            stage["total"] += span.duration
+            stage["max"] = max(stage["max"], span.duration)
+            stage["bytes"] += span.attrs.get("bytes", 0) or 0
+
+        lines = [
+            f"Run {self.run_id}: {self.turn} turns",
+            f"{'stage':<14} {'count':>5} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'bytes':>11}",
+        ]
+        for name, stage in sorted(stages.items(), key=lambda item: -item[1]["total"]):
+            lines.append(
+                f"{name:<14} {stage['count']:>5} {stage['total'] * 1000:>10.1f} "
+                f"{stage['total'] * 1000 / stage['count']:>9.1f} "
+                f"{stage['max'] * 1000:>9.1f} {stage['bytes']:>11}"
+            )
+        return "\n".join(lines)
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block under the current run's tracer; a no-op outside a run."""
+    tracer = _current.get()
+    if tracer is None:
+        yield _NullSpan()
+        return
+    with tracer.span(name, **attrs) as active:
+        yield active
+
+
+def current_tracer():
+    return _current.get()
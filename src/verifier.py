@@ -0,0 +1,81 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+UNCERTAIN = "uncertain"
+
+
+class StepVerifier:
+    """Judges locally whether the user's action on a highlight did anything.
+
+    The frame the model last saw, from before any highlight was shown, is
+    compared with one taken once the user has acted, both reduced the way
+    the watcher reduces its snapshots. The highlight circle and our own
+    window are masked out. The fraction of changed pixels around the target
+    and across the rest of the frame puts the step in one of three classes:
+
+    - CHANGED: a large change at the target or across the screen, such as
+      a window or menu opening
+    - UNCHANGED: practically nothing changed anywhere
+    - UNCERTAIN: anything in between, such as a hover effect or a small
+      toggle, which is left to the model
+
+    The thresholds are deliberately far apart so that only obvious cases
+    are decided locally.
+    """
+
+    def __init__(
+        self,
+        watcher,
+        changed_region=0.35,
+        changed_global=0.03,
+        unchanged_region=0.01,
+        unchanged_global=0.0005,
+        settle_time=0.3,
+    ):
+        self.watcher = watcher
+        self.changed_region = changed_region
+        self.changed_global = changed_global
+        self.unchanged_region = unchanged_region
+        self.unchanged_global = unchanged_global
+        self.settle_time = settle_time
+
+    def snapshot(self):
+        return self.watcher.snapshot()
+
+    def reduce(self, image):
+        return self.watcher.reduce(image)
+
+    def judge(self, before, target=None, highlight=None, exclude=()):
+        """Compare `before` with the screen now; returns (verdict, region, global).
+
+        `target` is the highlighted point in screen pixels, `highlight` the
+        circle as drawn, (x, y, radius), and `exclude` screen rectangles to
+        ignore.
+        """
+        after = self.snapshot()
+        if after.shape != before.shape:
+            return CHANGED, 1.0, 1.0
+        mask = self.watcher.mask(before.shape, target, highlight, exclude)
+        region_score, global_score = self.watcher.score(before, after, mask, target)
+        if target is None:
+            region_score = global_score
+
+        if region_score >= self.changed_region or global_score >= self.changed_global:
+            verdict = CHANGED
+        elif (
+            region_score < self.unchanged_region
+            and global_score < self.unchanged_global
+        ):
+            verdict = UNCHANGED
+        else:
+            verdict = UNCERTAIN
+        logger.info(
+            "Step verdict: %s (region=%.4f, global=%.4f)",
+            verdict,
+            region_score,
+            global_score,
+        )
+        return verdict, region_score, global_score
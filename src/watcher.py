@@ -0,0 +1,153 @@
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The drawn highlight pulses and has an outline beyond its nominal radius
+HIGHLIGHT_MARGIN = 10
+
+
+class ScreenChangeWatcher:
+    """Polls the screen at a low rate and reports when it really changed.
+
+    Frames are reduced by `scale` and converted to grayscale before they are
+    compared, so a poll costs a capture plus a few small NumPy operations.
+    A step counts as done when enough pixels changed either in the box around
+    the highlighted target or across the whole screen, and the screen has then
+    stopped changing for `settle_time` seconds. The highlight circle itself is
+    masked out so the overlay never triggers a change on its own.
+    """
+
+    def __init__(
+        self,
+        grab,
+        interval=0.25,
+        scale=8,
+        pixel_threshold=24,
+        region_radius=120,
+        region_fraction=0.08,
+        global_fraction=0.01,
+        settle_time=0.4,
+        highlight_radius=40,
+    ):
+        self.grab = grab
+        self.interval = interval
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.region_radius = region_radius
+        self.region_fraction = region_fraction
+        self.global_fraction = global_fraction
+        self.settle_time = settle_time
+        self.highlight_radius = highlight_radius
+
+    def snapshot(self):
+        return self.reduce(self.grab())
+
+    def reduce(self, image):
+        """The reduced grayscale array frames are compared as."""
+        small = image.reduce(self.scale).convert("L")
+        return np.asarray(small, dtype=np.int16)
+
+    def wait_for_change(
+        self, target=None, should_stop=None, timeout=None, highlight=None, exclude=()
+    ):
+        """Block until the screen changes, then settles.
+
+        `target` is the highlighted point in screen pixels, `highlight` the
+        circle as drawn, (x, y, radius), and `exclude` a list of screen
+        rectangles to ignore. Returns True on a change and False if
+        `should_stop` returned true or `timeout` expired.
+        """
+        baseline = self.snapshot()
+        mask = self.mask(baseline.shape, target, highlight, exclude)
+        deadline = time.monotonic() + timeout if timeout else None
+
+        while True:
+            if should_stop and should_stop():
+                return False
+            if deadline and time.monotonic() > deadline:
+                return False
+            time.sleep(self.interval)
+
+            frame = self.snapshot()
+            if frame.shape != baseline.shape:
+                # Display configuration changed; that is a change by itself
+                return True
+            region_score, global_score = self.score(baseline, frame, mask, target)
+            if (
+                region_score >= self.region_fraction
+                or global_score >= self.global_fraction
+            ):
+                logger.info(
+                    "Screen change detected (region=%.3f, global=%.3f)",
+                    region_score,
+                    global_score,
+                )
+                self._wait_until_settled(frame, mask, should_stop)
+                return True
+
+    def score(self, before, after, mask, target=None):
+        """Fraction of changed pixels around `target` and across the frame."""
+        changed = (np.abs(after - before) > self.pixel_threshold) & mask
+        global_score = changed.sum() / max(mask.sum(), 1)
+
+        if target is None:
+            return 0.0, float(global_score)
+        box = self._region(before.shape, target)
+        region_changed = changed[box]
+        region_score = region_changed.sum() / max(mask[box].sum(), 1)
+        return float(region_score), float(global_score)
+
+    def _wait_until_settled(self, frame, mask, should_stop):
+        stable_since = time.monotonic()
+        while time.monotonic() - stable_since < self.settle_time:
+            if should_stop and should_stop():
+                return
+            time.sleep(self.interval)
+            current = self.snapshot()
+            if current.shape != frame.shape:
+                frame = current
+                stable_since = time.monotonic()
+                continue
+            _, moving = self.score(frame, current, mask)
+            if moving >= self.global_fraction / 4:
+                stable_since = time.monotonic()
+            frame = current
+
+    def _region(self, shape, target):
+        x, y = target[0] // self.scale, target[1] // self.scale
+        r = max(self.region_radius // self.scale, 1)
+        return (
+            slice(max(y - r, 0), min(y + r, shape[0])),
+            slice(max(x - r, 0), min(x + r, shape[1])),
+        )
+
+    def mask(self, shape, target=None, highlight=None, exclude=()):
+        """Which reduced pixels to compare.
+
+        The highlight circle is left out: around `target` with
+        highlight_radius, and as drawn when `highlight` gives its
+        (x, y, radius). So are the `exclude` rectangles, given as
+        (left, top, right, bottom) in screen pixels, such as our own window
+        whose log and progress bar keep moving.
+        """
+        mask = np.ones(shape, dtype=bool)
+        circles = []
+        if target is not None:
+            circles.append((target[0], target[1], self.highlight_radius))
+        if highlight is not None:
+            x, y, radius = highlight
+            circles.append((x, y, radius + HIGHLIGHT_MARGIN))
+        if circles:
+            ys, xs = np.ogrid[: shape[0], : shape[1]]
+            for x, y, radius in circles:
+                cx, cy = x / self.scale, y / self.scale
+                r = radius / self.scale + 1
+                mask[(xs - cx) ** 2 + (ys - cy) ** 2 <= r * r] = False
+        for left, top, right, bottom in exclude:
+            rows = slice(max(top // self.scale, 0), max(-(-bottom // self.scale), 0))
+            cols = slice(max(left // self.scale, 0), max(-(-right // self.scale), 0))
+            mask[rows, cols] = False
+        return mask
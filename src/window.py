@@ -1,10 +1,22 @@
 import logging
 import math
-import platform
+import os
 
 import pyautogui
 import qtawesome as qta
-from PyQt6.QtCore import QPoint, QSettings, Qt, QThread, QUrl, pyqtSignal, pyqtSlot
+from PyQt6.QtCore import (
+    QElapsedTimer,
+    QEvent,
+    QPoint,
+    QPointF,
+    QSettings,
+    Qt,
+    QThread,
+    QTimer,
+    QUrl,
+    pyqtSignal,
+    pyqtSlot,
+)
 from PyQt6.QtGui import (
     QAction,
     QColor,
@@ -33,7 +45,8 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
-from .anthropic import AnthropicClient
+from .action_log import ActionLogView
+from .anthropic import reset_shared_client
 from .store import Store
 
 logger = logging.getLogger(__name__)
@@ -43,6 +56,7 @@ class AgentThread(QThread):
     update_signal = pyqtSignal(str)
     finished_signal = pyqtSignal()
     position_signal = pyqtSignal(int, int)  # New signal for position updates
+    clear_signal = pyqtSignal()  # The highlighted step is over
 
     def __init__(self, store):
         super().__init__()
@@ -52,7 +66,9 @@ class AgentThread(QThread):
         def position_callback(x, y):
             self.position_signal.emit(x, y)
 
-        self.store.run_agent(self.update_signal.emit, position_callback)
+        self.store.run_agent(
+            self.update_signal.emit, position_callback, self.clear_signal.emit
+        )
         self.finished_signal.emit()
 
     def update_overlay_position(self, x, y):
@@ -60,6 +76,19 @@ class AgentThread(QThread):
 
 
 class OverlayHighlight(QWidget):
+    """A small click-through window that sits on top of the target.
+
+    Only the circle's own bounding box is a window, so the compositor never
+    has to blend a full-screen surface. Moving to a new target moves the
+    window rather than repainting anything, and the pulse repaints just this
+    small surface from a timer capped at FRAME_RATE. The window is unmapped
+    whenever there is no active step.
+    """
+
+    FRAME_RATE = 30
+    PULSE_PERIOD = 1.2  # seconds
+    PULSE_AMPLITUDE = 6  # pixels added to the radius at the peak of a pulse
+
     def __init__(self):
         super().__init__(None)  # No parent
         # Make widget transparent and stay on top
@@ -67,6 +96,7 @@ class OverlayHighlight(QWidget):
             Qt.WindowType.FramelessWindowHint
             | Qt.WindowType.WindowStaysOnTopHint
             | Qt.WindowType.WindowTransparentForInput
+            | Qt.WindowType.Tool
         )
 
         # Set all required attributes
@@ -76,75 +106,80 @@ class OverlayHighlight(QWidget):
         # Ensure window has no focus policy
         self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
 
-        # Get screen geometry using Qt instead of pyautogui
-        screen = QApplication.primaryScreen()
-        screen_geometry = screen.geometry()
-        screen_width = screen_geometry.width()
-        screen_height = screen_geometry.height()
-
-        # Set the widget geometry to match the screen
-        self.setGeometry(screen_geometry)
-
-        # Move to top-left corner
-        self.move(0, 0)
-        # screen_width, screen_height = pyautogui.size()
-        # self.resize(screen_width, screen_height)
-        self.center_point = QPoint(0, 0)
+        self.center_point = QPoint(0, 0)  # Circle centre in screen coordinates
         self.radius = 32  # Circle radius in pixels
+        self.active = False  # Whether a step is currently highlighted
+        self.half_size = self.radius + self.PULSE_AMPLITUDE + 4
+        self.resize(self.half_size * 2, self.half_size * 2)
+
+        self.pulse_timer = QTimer(self)
+        self.pulse_timer.setInterval(1000 // self.FRAME_RATE)
+        self.pulse_timer.timeout.connect(self.update)
+        self.pulse_clock = QElapsedTimer()
 
         # Hide the widget initially
         self.hide()
-        # Add a flag to track if we've received any position updates
-        self.has_position = False
 
     def paintEvent(self, event):
-        # Only paint if we've received a position update
-        if not self.has_position:
-            return
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)  # Make it smooth
 
-        # Create translucent color
-        highlight_color = QColor(
-            0, 0, 0, 32
-        )  # RGBA format, alpha=128 for 50% transparency
-
-        # Set up the pen for circle border
-        pen = QPen(QColor(255, 0, 0), 2)  # Solid red border
-        painter.setPen(pen)
-
-        # Set the brush for circle fill
-        painter.setBrush(highlight_color)
+        phase = (self.pulse_clock.elapsed() / 1000) / self.PULSE_PERIOD
+        pulse = (1 - math.cos(2 * math.pi * phase)) / 2
+        radius = self.radius + self.PULSE_AMPLITUDE * pulse
 
-        # Draw the circle
-        painter.drawEllipse(self.center_point, self.radius, self.radius)
+        # Translucent fill with a solid red border
+        painter.setPen(QPen(QColor(255, 0, 0), 2))
+        painter.setBrush(QColor(0, 0, 0, 32))
+        center = QPointF(self.half_size, self.half_size)
+        painter.drawEllipse(center, radius, radius)
 
     @pyqtSlot(int, int)
     def update_position(self, x: int, y: int):
-        """Update the circle's center position and redraw."""
-        OFFSET = 0
-        if platform.system().lower() == "linux":
-            OFFSET = 28
-
+        """Move the circle to a new screen position and start pulsing."""
         try:
-            self.center_point = QPoint(int(x), int(y - OFFSET))
-            self.has_position = True  # Set flag to true when we get a position
-            self.raise_()
-            self.show()
-            self.update()
+            self.center_point = QPoint(int(x), int(y))
+            self.active = True
+            self.move(self.center_point - QPoint(self.half_size, self.half_size))
+            if not self.isVisible():
+                self.show()
+                self.raise_()
+                self.pulse_clock.start()
+                self.pulse_timer.start()
         except Exception as e:
             print(f"Update position error: {e}")
 
+    @pyqtSlot()
+    def clear(self):
+        """Unmap the overlay until the next step highlights something."""
+        self.active = False
+        self.pulse_timer.stop()
+        self.hide()
+
+    def highlight_geometry(self):
+        """(x, y, radius) of the circle as drawn on screen, or None.
+
+        Read from the agent's thread to hit-test clicks, so it only touches
+        plain attributes.
+        """
+        if not self.active:
+            return None
+        center = self.center_point
+        return (center.x(), center.y(), self.radius)
+
+    def hideEvent(self, event):
+        self.pulse_timer.stop()
+        super().hideEvent(event)
+
 
 class MainWindow(QMainWindow):
-    def __init__(self, store, anthropic_client):
+    def __init__(self, store):
         super().__init__()
         self.store = store
-        self.anthropic_client = anthropic_client
+        self.screen_rect = None  # Kept current for window_geometry()
 
-        # Create overlay
+        # Create overlay; it only appears while a step is highlighted
         self.overlay = OverlayHighlight()
-        self.overlay.show()
 
         # Initialize theme settings
         self.settings = QSettings("QuackSupport", "Preferences")
@@ -166,8 +201,28 @@ class MainWindow(QMainWindow):
         self.setup_menu_bar()
         self.setup_tray()
         self.setup_shortcuts()
+        self.setup_display_watch()
         self.oldPos = None
 
+    def setup_display_watch(self):
+        # Resolution or monitor changes invalidate the AI coordinate space
+        app = QApplication.instance()
+        app.primaryScreenChanged.connect(self.display_changed)
+        app.screenAdded.connect(self.display_changed)
+        app.screenRemoved.connect(self.display_changed)
+        self.watched_screen = None
+        self.watch_primary_screen()
+
+    def watch_primary_screen(self):
+        screen = QApplication.instance().primaryScreen()
+        if screen is not self.watched_screen:
+            screen.geometryChanged.connect(self.display_changed)
+            self.watched_screen = screen
+
+    def display_changed(self, *args):
+        self.watch_primary_screen()
+        self.store.on_display_changed()
+
     def show_api_key_dialog(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("API Key Required")
@@ -242,8 +297,9 @@ class MainWindow(QMainWindow):
             f.write(f"ANTHROPIC_API_KEY={api_key}")
 
         # Reinitialize the store and anthropic client
+        os.environ["ANTHROPIC_API_KEY"] = api_key
+        reset_shared_client()
         self.store = Store()
-        self.anthropic_client = AnthropicClient()
         dialog.accept()
 
     def setup_ui(self):
@@ -320,11 +376,10 @@ class MainWindow(QMainWindow):
         container_layout.addWidget(title_bar)
 
         # Action log with modern styling - Now at the top with flexible space
-        self.action_log = QTextEdit()
-        self.action_log.setReadOnly(True)
+        self.action_log = ActionLogView()
         self.action_log.setStyleSheet(
             """
-            QTextEdit {
+            QListView {
                 background-color: #262626;
                 border: none;
                 border-radius: 0;
@@ -396,6 +451,13 @@ class MainWindow(QMainWindow):
         )
         # Connect textChanged signal
         self.input_area.textChanged.connect(self.update_run_button)
+
+        # Capture the screen once typing pauses, so Run can start right away
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(600)
+        self.prefetch_timer.timeout.connect(lambda: self.store.prefetch_screenshot())
+        self.input_area.textChanged.connect(self.prefetch_timer.start)
         input_layout.addWidget(self.input_area)
 
         # Control buttons with modern styling
@@ -507,6 +569,7 @@ class MainWindow(QMainWindow):
                 "secondary_bg": "#262626",
                 "input_bg": "#1e1e1e",
                 "text": "#ffffff",
+                "log_text": "#e0e0e0",
                 "button_text": "#ffffff",  # Add button text color
                 "secondary_text": "#666666",
                 "border": "#333333",
@@ -523,6 +586,7 @@ class MainWindow(QMainWindow):
                 "secondary_bg": "#f5f5f5",
                 "input_bg": "#fafafa",
                 "text": "#000000",
+                "log_text": "#333333",
                 "button_text": "#000000",  # Add button text color
                 "secondary_text": "#666666",
                 "border": "#e0e0e0",
@@ -551,7 +615,7 @@ class MainWindow(QMainWindow):
         # Update action log
         self.action_log.setStyleSheet(
             f"""
-            QTextEdit {{
+            QListView {{
                 background-color: {colors['secondary_bg']};
                 border: none;
                 border-radius: 0;
@@ -562,6 +626,7 @@ class MainWindow(QMainWindow):
             }}
         """
         )
+        self.action_log.set_colors(colors)
 
         # Update input area
         self.input_area.setStyleSheet(
@@ -666,6 +731,9 @@ class MainWindow(QMainWindow):
 
     def update_run_button(self):
         self.run_button.setEnabled(bool(self.input_area.toPlainText().strip()))
+        # Typing means a run is likely soon; make sure a connection is warm
+        if self.store.anthropic_client:
+            self.store.anthropic_client.preconnect()
 
     def setup_menu_bar(self):
         # Create menu bar
@@ -680,11 +748,16 @@ class MainWindow(QMainWindow):
         new_task.setShortcut("Ctrl+N")
         new_task.triggered.connect(self.show)
 
+        resume_action = QAction("Resume Last Session", self)
+        resume_action.setShortcut("Ctrl+R")
+        resume_action.triggered.connect(self.resume_session)
+
         quit_action = QAction("Quit", self)
         quit_action.setShortcut("Ctrl+Q")
         quit_action.triggered.connect(self.quit_application)
 
         file_menu.addAction(new_task)
+        file_menu.addAction(resume_action)
         file_menu.addSeparator()
         file_menu.addAction(quit_action)
 
@@ -778,6 +851,8 @@ class MainWindow(QMainWindow):
             return
 
         self.store.set_instructions(instructions)
+        self.store.highlight_geometry = self.overlay.highlight_geometry
+        self.store.window_geometry = self.window_geometry
         self.run_button.setEnabled(False)
         self.stop_button.setEnabled(True)
         self.progress_bar.show()
@@ -786,13 +861,30 @@ class MainWindow(QMainWindow):
         self.agent_thread = AgentThread(self.store)
         self.agent_thread.update_signal.connect(self.update_log)
         self.agent_thread.finished_signal.connect(self.agent_finished)
-        self.agent_thread.finished_signal.connect(self.overlay.hide)
+        self.agent_thread.finished_signal.connect(self.overlay.clear)
+        self.agent_thread.clear_signal.connect(
+            self.overlay.clear, Qt.ConnectionType.QueuedConnection
+        )
 
         self.agent_thread.position_signal.connect(
             self.overlay.update_position, Qt.ConnectionType.QueuedConnection
         )
         self.agent_thread.start()  # This will now work properly
 
+    def resume_session(self):
+        if self.store.running:
+            return
+        try:
+            instructions = self.store.resume_session()
+        except Exception as e:
+            self.update_log(f"Could not resume the last session: {e}")
+            return
+        if instructions is None:
+            self.update_log("There is no interrupted session to resume.")
+            return
+        self.input_area.setPlainText(instructions)
+        self.run_agent()
+
     def stop_agent(self):
         self.store.stop_run()
         self.stop_button.setEnabled(False)
@@ -802,139 +894,11 @@ class MainWindow(QMainWindow):
         self.stop_button.setEnabled(False)
         self.progress_bar.hide()
 
-        # Yellow completion message with sparkle emoji
-        completion_message = """
-            <div style="margin: 6px 0;">
-                <span style="
-                    display: inline-flex;
-                    align-items: center;
-                    background-color: rgba(45, 45, 45, 0.95);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                    border-radius: 100px;
-                    padding: 4px 12px;
-                    color: #FFD700;
-                    font-family: Inter, -apple-system, system-ui, sans-serif;
-                    font-size: 13px;
-                    line-height: 1.4;
-                    white-space: nowrap;
-                ">✨ Agent run completed</span>
-            </div>
-        """
-        self.action_log.append(completion_message)
+        self.action_log.append_completion("✨ Agent run completed")
 
     def update_log(self, message):
-        if message.startswith("Performed action:"):
-            action_text = message.replace("Performed action:", "").strip()
-
-            # Pill-shaped button style with green text
-            button_style = """
-                <div style="margin: 6px 0;">
-                    <span style="
-                        display: inline-flex;
-                        align-items: center;
-                        background-color: rgba(45, 45, 45, 0.95);
-                        border: 1px solid rgba(255, 255, 255, 0.1);
-                        border-radius: 100px;
-                        padding: 4px 12px;
-                        color: #4CAF50;
-                        font-family: Inter, -apple-system, system-ui, sans-serif;
-                        font-size: 13px;
-                        line-height: 1.4;
-                        white-space: nowrap;
-                    ">{}</span>
-                </div>
-            """
-
-            try:
-                import json
-
-                action_data = json.loads(action_text)
-                action_type = action_data.get("type", "").lower()
-
-                if action_type == "type":
-                    text = action_data.get("text", "")
-                    msg = f'⌨️ <span style="margin: 0 4px; color: #4CAF50;">Type</span> <span style="color: #4CAF50">"{text}"</span>'
-                    self.action_log.append(button_style.format(msg))
-
-                elif action_type == "key":
-                    key = action_data.get("text", "")
-                    msg = f'⌨️ <span style="margin: 0 4px; color: #4CAF50;">Press</span> <span style="color: #4CAF50">{key}</span>'
-                    self.action_log.append(button_style.format(msg))
-
-                elif action_type == "mouse_move":
-                    x = action_data.get("x", 0)
-                    y = action_data.get("y", 0)
-                    msg = f'🖱️ <span style="margin: 0 4px; color: #4CAF50;">Move to</span> <span style="color: #4CAF50">({x}, {y})</span>'
-                    self.action_log.append(button_style.format(msg))
-
-                elif action_type == "screenshot":
-                    msg = '📸 <span style="margin: 0 4px; color: #4CAF50;">Captured Screenshot</span>'
-                    self.action_log.append(button_style.format(msg))
-
-                elif "click" in action_type:
-                    x = action_data.get("x", 0)
-                    y = action_data.get("y", 0)
-                    click_map = {
-                        "left_click": "Left Click",
-                        "right_click": "Right Click",
-                        "middle_click": "Middle Click",
-                        "double_click": "Double Click",
-                    }
-                    click_type = click_map.get(action_type, "Click")
-                    msg = f'👆 <span style="margin: 0 4px; color: #4CAF50;">{click_type}</span> <span style="color: #4CAF50">({x}, {y})</span>'
-                    self.action_log.append(button_style.format(msg))
-
-            except json.JSONDecodeError:
-                self.action_log.append(button_style.format(action_text))
-
-        # Clean assistant message style without green background
-        elif message.startswith("Assistant:"):
-            message_style = """
-                <div style="
-                    border-left: 2px solid #666;
-                    padding: 8px 16px;
-                    margin: 8px 0;
-                    font-family: Inter, -apple-system, system-ui, sans-serif;
-                    font-size: 13px;
-                    line-height: 1.5;
-                    color: #e0e0e0;
-                ">{}</div>
-            """
-            clean_message = message.replace("Assistant:", "").strip()
-            self.action_log.append(message_style.format(f"💬 {clean_message}"))
-
-        # Subtle assistant action style
-        elif message.startswith("Assistant action:"):
-            action_style = """
-                <div style="
-                    color: #666;
-                    font-style: italic;
-                    padding: 4px 0;
-                    font-size: 12px;
-                    font-family: Inter, -apple-system, system-ui, sans-serif;
-                    line-height: 1.4;
-                ">🤖 {}</div>
-            """
-            clean_message = message.replace("Assistant action:", "").strip()
-            self.action_log.append(action_style.format(clean_message))
-
-        # Regular message style
-        else:
-            regular_style = """
-                <div style="
-                    padding: 4px 0;
-                    color: #e0e0e0;
-                    font-family: Inter, -apple-system, system-ui, sans-serif;
-                    font-size: 13px;
-                    line-height: 1.4;
-                ">{}</div>
-            """
-            self.action_log.append(regular_style.format(message))
-
-        # Scroll to bottom
-        self.action_log.verticalScrollBar().setValue(
-            self.action_log.verticalScrollBar().maximum()
-        )
+        # Parsing and styling happen in the model and delegate; this only queues
+        self.action_log.append(message)
 
     def mousePressEvent(self, event):
         self.oldPos = event.globalPosition().toPoint()
@@ -954,6 +918,47 @@ class MainWindow(QMainWindow):
             self.move(self.x() + delta.x(), self.y() + delta.y())
             self.oldPos = event.globalPosition().toPoint()
 
+    def window_geometry(self):
+        """(left, top, right, bottom) of this window on screen, or None.
+
+        Read from the agent's thread so the step verifier can ignore our own
+        log and progress bar, so it only touches a plain attribute.
+        """
+        return self.screen_rect
+
+    def update_screen_rect(self):
+        if self.isVisible() and not self.isMinimized():
+            frame = self.frameGeometry()
+            self.screen_rect = (
+                frame.left(),
+                frame.top(),
+                frame.left() + frame.width(),
+                frame.top() + frame.height(),
+            )
+        else:
+            self.screen_rect = None
+
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.update_screen_rect()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_screen_rect()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_screen_rect()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.screen_rect = None
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self.update_screen_rect()
+
     def closeEvent(self, event):
         # Override close event to minimize to tray instead of quitting
         event.ignore()
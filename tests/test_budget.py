@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("anthropic")
+
+from src.budget import (  # noqa: E402
+    DEGRADE_AT,
+    DEGRADE_STEPS,
+    PIXELS_PER_TOKEN,
+    BudgetExceeded,
+    TokenBudget,
+)
+from src.history import HistoryPolicy, count_images  # noqa: E402
+
+AI_SIZE = (1280, 800)
+IMAGE_TOKENS = AI_SIZE[0] * AI_SIZE[1] // PIXELS_PER_TOKEN
+
+
+def screenshot():
+    width, height = AI_SIZE
+    source = {"type": "blob", "width": width, "height": height, "bytes": 1000}
+    return {"role": "user", "content": [{"type": "image", "source": source}]}
+
+
+def computer():
+    return SimpleNamespace(ai_size=AI_SIZE, image_scale=1.0, foveated=False)
+
+
+def enforce(budget, history, control, policy=None):
+    policy = policy or HistoryPolicy(max_screenshots=3)
+    return asyncio.run(budget.enforce(history, policy, control))
+
+
+def base_tokens():
+    return TokenBudget().estimate([])
+
+
+def test_request_under_the_limit_is_untouched():
+    history = [screenshot() for _ in range(3)]
+    budget = TokenBudget(per_turn=100000)
+    control = computer()
+
+    assert enforce(budget, history, control) == base_tokens() + 3 * IMAGE_TOKENS
+    assert count_images(history) == 3
+    assert budget.degrade_level == 0
+    assert control.image_scale == 1.0
+
+
+def test_trims_history_until_the_request_fits():
+    history = [screenshot() for _ in range(3)]
+    # Room for one screenshot but not two
+    budget = TokenBudget(per_turn=base_tokens() + 3 * IMAGE_TOKENS // 2)
+
+    estimate = enforce(budget, history, computer())
+
+    assert count_images(history) == 1
+    assert base_tokens() + IMAGE_TOKENS <= estimate <= budget.per_turn
+
+
+def test_degrades_screenshots_step_by_step_near_the_limit():
+    # Trimming to one screenshot fits, but above DEGRADE_AT of the limit
+    limit = int((base_tokens() + IMAGE_TOKENS) / ((1 + DEGRADE_AT) / 2))
+    budget = TokenBudget(per_turn=limit)
+    control = computer()
+
+    for level, step in enumerate(DEGRADE_STEPS, 1):
+        enforce(budget, [screenshot(), screenshot()], control)
+        assert budget.degrade_level == level
+        assert control.image_scale == step["image_scale"]
+        assert control.foveated == step.get("foveated", False)
+
+    # Nothing cheaper is left to try
+    enforce(budget, [screenshot(), screenshot()], control)
+    assert budget.degrade_level == len(DEGRADE_STEPS)
+
+
+def test_request_that_cannot_fit_raises():
+    budget = TokenBudget(per_turn=base_tokens() + IMAGE_TOKENS // 2)
+
+    with pytest.raises(BudgetExceeded):
+        enforce(budget, [screenshot()], computer())
+
+
+def test_spent_run_budget_raises_before_estimating():
+    budget = TokenBudget(per_run=base_tokens() + 1000)
+    budget.record(SimpleNamespace(input_tokens=600, cache_read_input_tokens=400))
+
+    # Cache reads count towards the run, leaving exactly the bare request
+    assert budget.limit == base_tokens()
+    assert enforce(budget, [], computer()) == base_tokens()
+    budget.record(SimpleNamespace(input_tokens=base_tokens()))
+    with pytest.raises(BudgetExceeded, match="used up"):
+        enforce(budget, [], computer())
+
+    budget.reset()
+    assert enforce(budget, [], computer()) == base_tokens()
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+pytest.importorskip("anthropic")
+pytest.importorskip("PyQt6")
+
+from PIL import Image  # noqa: E402
+
+from src.computer import ComputerControl  # noqa: E402
+from src.input import ClickEvent  # noqa: E402
+from src.replay import ScriptedScreen  # noqa: E402
+from src.store import Store  # noqa: E402
+
+SIZE = (1920, 1080)
+TARGET = (500, 500)
+RADIUS = 38
+
+
+class FakeInput:
+    """Input listener that returns a fixed list of clicks, then None."""
+
+    def __init__(self, points):
+        self.clicks = [ClickEvent(x, y, "left", 0.0) for x, y in points]
+        self.waits = 0
+
+    def clear(self):
+        pass
+
+    def cancel(self):
+        pass
+
+    async def wait_for_click_async(self, timeout=None):
+        self.waits += 1
+        return self.clicks.pop(0) if self.clicks else None
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setenv("CLICK_MISS_DISTANCE", "120")
+    monkeypatch.setenv("CLICK_MISS_LIMIT", "2")
+    screen = ScriptedScreen([Image.new("RGB", SIZE)])
+    store = Store(
+        anthropic_client=object(),
+        computer_control=ComputerControl(capture=screen, screen_size=SIZE),
+        input_listener=FakeInput([]),
+        advance_on="click",
+        stream=False,
+        sessions=None,
+        recipes=None,
+        record_dir=None,
+    )
+    store.running = True
+    store.last_target = TARGET
+    store.highlight_geometry = lambda: (*TARGET, RADIUS)
+    return store
+
+
+def wait(store, points):
+    store.input_listener = FakeInput(points)
+    updates = []
+    accepted = asyncio.run(store._wait_for_user_action(None, updates.append))
+    misses = sum("outside the highlighted area" in text for text in updates)
+    return accepted, misses
+
+
+def test_hit_is_accepted_and_noted(store):
+    accepted, misses = wait(store, [(510, 500)])
+
+    assert accepted
+    assert misses == 0
+    click, distance, radius = store.last_click
+    assert (click.x, click.y) == (510, 500)
+    assert distance == 10
+    assert radius == RADIUS
+    assert store._click_note().endswith("inside the highlighted area.")
+
+
+def test_near_miss_is_accepted(store):
+    # Outside the circle but within CLICK_MISS_DISTANCE
+    accepted, misses = wait(store, [(600, 500)])
+
+    assert accepted
+    assert misses == 0
+    assert "px from the highlighted target" in store._click_note()
+
+
+def test_repeated_misses_are_accepted_after_the_limit(store):
+    accepted, misses = wait(store, [(900, 500)] * 3)
+
+    assert accepted
+    assert misses == store.click_miss_limit == 2
+    assert store.input_listener.waits == 3
+    assert store.last_click[1] == 400
+    scale = store.computer_control.ai_size[0] / SIZE[0]
+    assert f"about {400 * scale:.0f} px from" in store._click_note()
+
+
+def test_miss_then_hit_keeps_the_hit(store):
+    accepted, misses = wait(store, [(900, 500), (500, 520)])
+
+    assert accepted
+    assert misses == 1
+    assert store.last_click[1] == 20
+    assert store._click_note().endswith("inside the highlighted area.")
+
+
+def test_cancelled_wait_records_no_click(store):
+    accepted, misses = wait(store, [(900, 500)])
+
+    assert not accepted
+    assert misses == 1
+    assert store.last_click is None
+    assert store._click_note() is None
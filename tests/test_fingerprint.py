@@ -0,0 +1,119 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src.computer import ComputerControl  # noqa: E402
+from src.fingerprint import (  # noqa: E402
+    EncodedFrameCache,
+    Fingerprint,
+    distance,
+    fingerprint,
+    same_frame,
+)
+
+SIZE = (1280, 800)
+UNCHANGED_TEXT = (
+    "The action was executed. The screen is unchanged since the previous screenshot."
+)
+
+
+class Screen:
+    """Capture backend showing one frame at a time until advanced."""
+
+    name = "test"
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def grab(self):
+        return self.frames[0]
+
+    def advance(self):
+        self.frames = self.frames[1:]
+
+
+def desktop(clock="12:00"):
+    image = Image.new("RGB", SIZE, (40, 90, 140))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 100, 600, 500), fill="white")
+    draw.text((1200, 780), clock, fill="white")
+    return image
+
+
+def test_distance_counts_differing_bits():
+    a = Fingerprint("a", 0b1011)
+    b = Fingerprint("b", 0b0110)
+
+    assert distance(a, a) == 0
+    assert distance(a, b) == 3
+
+
+def test_same_frame_exact_needs_identical_pixels():
+    first = fingerprint(desktop())
+
+    assert same_frame(first, fingerprint(desktop()))
+    assert not same_frame(first, fingerprint(desktop("12:01")))
+    assert not same_frame(first, None)
+    assert not same_frame(None, None)
+
+
+def test_same_frame_perceptual_tolerates_small_changes():
+    first = fingerprint(desktop())
+    clock = fingerprint(desktop("12:01"))
+    window = Image.new("RGB", SIZE, (40, 90, 140))
+    ImageDraw.Draw(window).rectangle((700, 100, 1200, 500), fill="white")
+    moved = fingerprint(window)
+
+    assert distance(first, clock) <= 4
+    assert same_frame(first, clock, max_distance=4)
+    assert not same_frame(first, moved, max_distance=4)
+
+
+def test_frame_cache_evicts_least_recently_used():
+    cache = EncodedFrameCache(maxsize=2)
+    cache.put("a", b"A")
+    cache.put("b", b"B")
+    assert cache.get("a") == b"A"  # "b" is now the oldest
+    cache.put("c", b"C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"A"
+    assert cache.get("c") == b"C"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_frame_cache_disabled_keeps_nothing():
+    cache = EncodedFrameCache(maxsize=0)
+    cache.put("a", b"A")
+
+    assert cache.get("a") is None
+
+
+@pytest.mark.parametrize(
+    "dedup, second, unchanged",
+    [
+        ("exact", "12:00", True),
+        ("exact", "12:01", False),
+        ("perceptual", "12:01", True),
+        ("off", "12:00", False),
+    ],
+)
+def test_screenshot_content_reports_unchanged_screen(
+    monkeypatch, dedup, second, unchanged
+):
+    monkeypatch.setenv("FRAME_DEDUP", dedup)
+    screen = Screen([desktop(), desktop(second)])
+    computer = ComputerControl(capture=screen, screen_size=SIZE, foveated=False)
+
+    first = computer.screenshot_content()
+    screen.advance()
+    content = computer.screenshot_content()
+
+    assert first[-1]["type"] == "image"
+    if unchanged:
+        assert content == [{"type": "text", "text": UNCHANGED_TEXT}]
+    else:
+        assert content[-1]["type"] == "image"
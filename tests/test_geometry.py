@@ -0,0 +1,52 @@
+import pytest
+
+from src.geometry import DisplayGeometry
+
+
+@pytest.mark.parametrize(
+    "screen, name, ai_size",
+    [
+        ((1920, 1080), "FWXGA", (1366, 768)),
+        ((2560, 1600), "WXGA", (1280, 800)),
+        ((2048, 1536), "XGA", (1024, 768)),
+        ((1280, 800), "native", (1280, 800)),
+        ((1024, 640), "native", (1024, 640)),
+    ],
+)
+def test_picks_the_smallest_matching_resolution(screen, name, ai_size):
+    geometry = DisplayGeometry(*screen)
+
+    assert geometry.name == name
+    assert geometry.ai_size == ai_size
+    assert geometry.screen_size == screen
+
+
+def test_unusual_aspect_ratio_is_scaled_to_fit():
+    geometry = DisplayGeometry(3440, 1440)
+
+    assert geometry.name == "scaled"
+    width, height = geometry.ai_size
+    assert width <= 1366 and height <= 768
+    assert width / height == pytest.approx(3440 / 1440, rel=0.01)
+
+
+def test_small_unusual_screen_is_not_upscaled():
+    assert DisplayGeometry(800, 200).ai_size == (800, 200)
+
+
+def test_maps_between_screen_and_ai_space():
+    geometry = DisplayGeometry(2560, 1600)
+
+    assert geometry.to_ai(2560, 1600) == (1280, 800)
+    assert geometry.to_ai(1000, 500) == (500, 250)
+    assert geometry.to_screen(500, 250) == (1000, 500)
+    x, y = geometry.to_screen(*geometry.to_ai(1234, 567))
+    assert (x, y) == (pytest.approx(1234), pytest.approx(567))
+
+
+def test_matches_only_the_same_screen_size():
+    geometry = DisplayGeometry(1920, 1080)
+
+    assert geometry.matches(1920, 1080)
+    assert not geometry.matches(1080, 1920)
+    assert not geometry.matches(2560, 1440)
@@ -0,0 +1,85 @@
+import pytest
+
+from src.history import STUB_PREFIX, HistoryPolicy, count_images
+
+
+def image():
+    return {"type": "image", "source": {"type": "base64", "data": "AAAA"}}
+
+
+def step(*images):
+    """A tool_result message holding one screenshot step."""
+    return {
+        "role": "user",
+        "content": [
+            {
+                "type": "tool_result",
+                "tool_use_id": "toolu_1",
+                "content": [{"type": "text", "text": "screen"}, *images],
+            }
+        ],
+    }
+
+
+def stubs(run_history):
+    return [
+        block["text"]
+        for message in run_history
+        for block in message["content"][0]["content"]
+        if block["type"] == "text" and block["text"].startswith(STUB_PREFIX)
+    ]
+
+
+def test_keeps_only_the_newest_screenshots():
+    history = [step(image()) for _ in range(5)]
+
+    assert HistoryPolicy(max_screenshots=3).apply(history) == 2
+    assert count_images(history) == 3
+    assert stubs(history) == [
+        f"{STUB_PREFIX} 1 omitted to save context]",
+        f"{STUB_PREFIX} 2 omitted to save context]",
+    ]
+    assert history[0]["content"][0]["content"][0]["text"] == "screen"
+
+
+def test_trim_batch_lets_history_grow_before_cutting_back():
+    policy = HistoryPolicy(max_screenshots=2, trim_batch=2)
+    history = [step(image()) for _ in range(4)]
+
+    assert policy.apply(history) == 0
+    assert count_images(history) == 4
+
+    history.append(step(image()))
+    assert policy.apply(history) == 3
+    assert count_images(history) == 2
+
+
+def test_foveated_step_counts_once_and_leaves_one_stub():
+    history = [step(image(), image()), step(image())]
+
+    assert HistoryPolicy(max_screenshots=1).apply(history) == 1
+    assert count_images(history) == 1
+    assert stubs(history) == [f"{STUB_PREFIX} 1 omitted to save context]"]
+
+
+def test_step_numbers_continue_across_trims():
+    policy = HistoryPolicy(max_screenshots=1)
+    history = [step(image()), step(image())]
+    policy.apply(history)
+    history.append(step(image()))
+
+    assert policy.apply(history) == 1
+    assert stubs(history)[-1] == f"{STUB_PREFIX} 2 omitted to save context]"
+
+
+def test_text_only_history_is_left_alone():
+    history = [{"role": "user", "content": "Open the settings"}]
+
+    assert HistoryPolicy(max_screenshots=1).apply(history) == 0
+    assert history == [{"role": "user", "content": "Open the settings"}]
+
+
+@pytest.mark.parametrize("max_screenshots, trim_batch", [(0, 0), (1, -1)])
+def test_rejects_invalid_limits(max_screenshots, trim_batch):
+    with pytest.raises(ValueError):
+        HistoryPolicy(max_screenshots, trim_batch)
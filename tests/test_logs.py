@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+
+from src import logs
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    path = tmp_path / "agent.log"
+    monkeypatch.setenv("LOG_FILE", str(path))
+    monkeypatch.setenv("LOG_CONSOLE_LEVEL", "CRITICAL")
+    monkeypatch.setenv("LOG_MAX_BYTES", "0")  # never rotate
+    yield path
+    logs.stop_logging()
+
+
+def test_stop_writes_every_queued_record(log_file):
+    logs.configure_logging()
+    logger = logging.getLogger("test.logs")
+    for i in range(20000):
+        logger.info("record %d", i)
+    logs.stop_logging()
+
+    lines = log_file.read_text().splitlines()
+    assert len(lines) == 20000
+    assert lines[-1].endswith("record 19999")
+
+
+def test_single_record_survives_stop(log_file):
+    logs.configure_logging()
+    logging.getLogger("test.logs").info("hello world")
+    logs.stop_logging()
+
+    assert "hello world" in log_file.read_text()
+
+
+def test_stop_ends_listener_thread(log_file):
+    listener = logs.configure_logging()
+    assert logs._listener is listener
+    logs.stop_logging()
+
+    assert logs._listener is None
+    assert listener._thread is None
+
+
+def test_reconfigure_does_not_leak_listeners(log_file):
+    first = logs.configure_logging()
+    first_thread = first._thread
+    second = logs.configure_logging()
+
+    assert not first_thread.is_alive()
+    assert logs._listener is second
+
+
+def test_redacts_base64_payloads(log_file):
+    logs.configure_logging()
+    logging.getLogger("test.logs").info("image %s", "A" * 5000)
+    logs.stop_logging()
+
+    text = log_file.read_text()
+    assert "<base64 5000 chars>" in text
+    assert "A" * 256 not in text
@@ -0,0 +1,53 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("anthropic")
+
+from src.sessions import SessionStore  # noqa: E402
+
+DAY = 24 * 3600
+
+
+def screenshot_message(block):
+    return {"role": "user", "content": [{"type": "text", "text": "screen"}, block]}
+
+
+def backdate(store, session_id, path, age):
+    then = time.time() - age
+    with store.db:
+        store.db.execute(
+            "UPDATE sessions SET updated = ? WHERE id = ?", (then, session_id)
+        )
+    os.utime(path, (then, then))
+
+
+def test_prune_drops_old_sessions_and_unused_blobs(tmp_path):
+    store = SessionStore(str(tmp_path))
+    old = store.start("old run")
+    old_only = store.put_image(b"old frame", "image/png", (10, 10))
+    shared = store.put_image(b"shared frame", "image/png", (10, 10))
+    store.append(old, screenshot_message(old_only))
+    store.append(old, screenshot_message(shared))
+    backdate(store, old, old_only["source"]["path"], 30 * DAY)
+    backdate(store, old, shared["source"]["path"], 30 * DAY)
+
+    recent = store.start("recent run")
+    store.append(recent, screenshot_message(shared))
+
+    assert store.prune(14 * DAY) == (1, 1)
+    assert not os.path.exists(old_only["source"]["path"])
+    assert os.path.exists(shared["source"]["path"])
+    with pytest.raises(KeyError):
+        store.load(old)
+    assert store.load(recent)[0] == "recent run"
+
+
+def test_prune_keeps_fresh_unreferenced_blobs(tmp_path):
+    store = SessionStore(str(tmp_path))
+    # Written for a message that has not been appended yet
+    block = store.put_image(b"in flight", "image/png", (10, 10))
+
+    assert store.prune(14 * DAY) == (0, 0)
+    assert os.path.exists(block["source"]["path"])
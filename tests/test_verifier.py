@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+pytest.importorskip("anthropic")
+pytest.importorskip("PyQt6")
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from src.computer import ComputerControl  # noqa: E402
+from src.replay import ReplayClient, ScriptedInput, finish, move_to  # noqa: E402
+from src.store import Store  # noqa: E402
+from src.verifier import UNCHANGED  # noqa: E402
+
+SIZE = (1920, 1080)
+WINDOW = (1400, 300, 1850, 900)
+RADIUS = 38
+
+
+class DesktopWithOverlay:
+    """A static desktop plus what the real screen shows on top of it.
+
+    The highlight circle is drawn while it is shown, and the app window's log
+    and progress bar change on every grab, as they do during a run.
+    """
+
+    name = "overlay"
+
+    def __init__(self):
+        self.base = Image.new("RGB", SIZE, (40, 90, 140))
+        draw = ImageDraw.Draw(self.base)
+        for i in range(12):
+            box = (100 + i * 90, 200, 160 + i * 90, 260)
+            draw.rectangle(box, fill=(200, 200, 90))
+        self.highlight = None
+        self.grabs = 0
+
+    def show(self, x, y):
+        self.highlight = (x, y)
+
+    def clear(self):
+        self.highlight = None
+
+    def geometry(self):
+        return (*self.highlight, RADIUS) if self.highlight else None
+
+    def grab(self):
+        self.grabs += 1
+        image = self.base.copy()
+        draw = ImageDraw.Draw(image)
+        left, top, right, bottom = WINDOW
+        draw.rectangle(WINDOW, fill="white")
+        for line in range(self.grabs % 25):
+            draw.text((left + 10, top + 10 + line * 20), f"log {line}", fill="black")
+        width = (self.grabs * 37) % (right - left - 20)
+        bar = (left + 10, bottom - 30, left + 10 + width, bottom - 10)
+        draw.rectangle(bar, fill="blue")
+        if self.highlight:
+            x, y = self.highlight
+            draw.ellipse(
+                (x - RADIUS, y - RADIUS, x + RADIUS, y + RADIUS), outline="red", width=4
+            )
+        return image
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_STORE_DIR", "")
+    monkeypatch.setenv("RECIPE_FILE", "")
+    monkeypatch.setenv("TRACE_FILE", str(tmp_path / "trace.jsonl"))
+    monkeypatch.setenv("VERIFY_STEPS", "1")
+
+
+@pytest.mark.parametrize("retries", [0, 1])
+def test_noop_click_is_unchanged_while_streaming(env, monkeypatch, retries):
+    monkeypatch.setenv("VERIFY_RETRIES", str(retries))
+    screen = DesktopWithOverlay()
+    computer = ComputerControl(capture=screen, screen_size=SIZE)
+    x, y = computer.map_to_ai_space(700, 600)
+    client = ReplayClient(
+        [move_to(round(x), round(y), "Click the button."), finish()], latency=0.0
+    )
+    store = Store(
+        anthropic_client=client,
+        computer_control=computer,
+        stream=True,
+        advance_on="click",
+        input_listener=ScriptedInput(delay=0.05),
+    )
+    # The click lands on the highlight but does nothing
+    store.input_listener.target = lambda: store.last_target
+    store.record_dir = None
+    store.highlight_geometry = screen.geometry
+    store.window_geometry = lambda: WINDOW
+    store.set_instructions("Press the button")
+
+    asyncio.run(store.run_agent_async(lambda message: None, screen.show, screen.clear))
+
+    assert store.error is None
+    # Every retry is a local re-prompt, not a model turn
+    assert len(store.input_listener.clicks) == retries + 1
+    tool_result = client.requests[1][-1]["content"][0]
+    texts = [
+        block["text"] for block in tool_result["content"] if block["type"] == "text"
+    ]
+    assert store._verdict_note(UNCHANGED) in texts
+    assert ("retry" in store._verdict_note(UNCHANGED)) == bool(retries)